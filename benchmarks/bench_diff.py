@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Benchmark ``show_diff`` on revisions of MARCXML records.
+
+Usage: ``python benchmarks/bench_diff.py``
+
+Every revision of a small and of a large record is compared with both
+algorithms, and with the Myers algorithm limited to 100 lines.  The table
+shows the number of changed lines found by the Myers algorithm and the
+time each comparison took.
+"""
+
+from __future__ import print_function
+
+import random
+import time
+
+from invenio_utils.text import show_diff
+
+WORDS = ('quark gluon boson lepton hadron collider detector luminosity '
+         'neutrino muon electron photon symmetry gauge field theory').split()
+
+
+def datafield(tag, subfields, ind1=' ', ind2=' '):
+    """Return the lines of a MARCXML datafield."""
+    lines = ['  <datafield tag="{0}" ind1="{1}" ind2="{2}">'.format(
+        tag, ind1, ind2)]
+    lines.extend('    <subfield code="{0}">{1}</subfield>'.format(code, value)
+                 for code, value in subfields)
+    lines.append('  </datafield>')
+    return lines
+
+
+def make_record(rnd, nb_authors, nb_references):
+    """Return the lines of a MARCXML record as a list of fields."""
+    def words(count):
+        return ' '.join(rnd.choice(WORDS) for dummy in range(count))
+
+    fields = [['  <controlfield tag="001">1234567</controlfield>'],
+              ['  <controlfield tag="005">20150601120000.0</controlfield>'],
+              datafield('245', [('a', words(10))]),
+              datafield('520', [('a', words(150))])]
+    for i in range(nb_authors):
+        fields.append(datafield('700', [
+            ('a', '{0}, {1}.'.format(words(1).title(), 'ABCDEFGH'[i % 8])),
+            ('u', 'CERN'), ('i', 'INSPIRE-{0:08d}'.format(i))]))
+    for i in range(nb_references):
+        journal = 'Phys.Rev.,D{0},{1}'.format(rnd.randint(1, 99),
+                                              rnd.randint(1, 9999))
+        fields.append(datafield('999', [
+            ('o', str(i + 1)), ('h', words(2).title()), ('t', words(6)),
+            ('s', journal)], 'C', '5'))
+    return fields
+
+
+def revisions(rnd, fields):
+    """Yield ``(name, fields)`` of typical record revisions."""
+    revised = [list(field) for field in fields]
+    revised[2][1] = revised[2][1].replace('</', ' (erratum)</')
+    yield 'title fix', revised
+
+    position = len(fields) // 2
+    yield 'new authors', fields[:position] + [
+        datafield('700', [('a', 'Doe, J.'), ('u', 'DESY')])] * 20 + \
+        fields[position:]
+
+    revised = []
+    for field in fields:
+        draw = rnd.random()
+        if draw < 0.03:
+            continue
+        field = list(field)
+        if draw < 0.08:
+            field[-2] = field[-2].replace('</', ' (curated)</')
+        revised.append(field)
+        if draw > 0.98:
+            revised.append(datafield('035', [('a', 'arXiv')]))
+    yield 'curation', revised
+
+    yield 'moved block', fields[:4] + fields[len(fields) // 2:] + \
+        fields[4:len(fields) // 2]
+
+    # every line of the last fields changes a little, which makes Differ
+    # compare each removed line with each added one
+    position = len(fields) - 100
+    yield 'reindented', fields[:position] + [
+        [line.replace('  ', '\t') for line in field]
+        for field in fields[position:]]
+
+
+def flatten(fields):
+    """Return the record as a string."""
+    return '\n'.join(['<record>'] + [line for field in fields
+                                     for line in field] + ['</record>'])
+
+
+def main():
+    """Print the benchmark table."""
+    rnd = random.Random(42)
+    print('{0:<8} {1:<12} {2:>7} {3:>7} {4:>10} {5:>10} {6:>10}'.format(
+        'record', 'revision', 'lines', 'diff', 'differ s', 'myers s',
+        'myers 100'))
+    for size, nb_authors, nb_references in (('small', 10, 20),
+                                            ('large', 300, 600)):
+        fields = make_record(rnd, nb_authors, nb_references)
+        original = flatten(fields)
+        for name, revised in revisions(rnd, fields):
+            modified = flatten(revised)
+            row = [size, name, original.count('\n') + 1]
+            timings = []
+            for kwargs in ({'algorithm': 'differ'}, {'algorithm': 'myers'},
+                           {'algorithm': 'myers', 'max_lines': 100}):
+                start = time.time()
+                result = show_diff(original, modified, **kwargs)
+                timings.append(time.time() - start)
+                if len(timings) == 2:
+                    row.append(sum(1 for line in result.split('\n')
+                                   if line[:1] in '-+'))
+            print('{0:<8} {1:<12} {2:>7} {3:>7} {4:>10.3f} {5:>10.3f} '
+                  '{6:>10.3f}'.format(*(row + timings)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Benchmark escaping and other string transforms on record fields.
+
+Usage: ``python benchmarks/bench_escape.py``
+
+Every function is measured on fields of typical lengths (an author name,
+a title and an abstract) that are clean, need escaping, or contain
+non-ASCII characters.  ``EscapedXMLString`` relies on the washing variant
+of ``encode_for_xml``; exporters call the other transforms on every field.
+"""
+
+from __future__ import print_function
+
+import re
+import timeit
+
+from unidecode import unidecode
+
+from invenio_utils.text import encode_for_xml, escape_latex, \
+    remove_line_breaks, slugify
+
+NUMBER = 20000
+
+AUTHOR = 'Ellis, John R.'
+TITLE = ('Measurement of the W boson mass with the ATLAS detector at '
+         'sqrt(s) = 7 TeV')
+ABSTRACT = ('A measurement of the mass of the W boson is presented based on '
+            'proton-proton collisions recorded in 2011 with the ATLAS '
+            'detector at the LHC. ') * 8
+
+FIELDS = []
+for field_name, field in (('author', AUTHOR), ('title', TITLE),
+                          ('abstract', ABSTRACT)):
+    FIELDS.append((field_name, 'clean', field))
+    FIELDS.append((field_name, 'escape',
+                   field.replace(' the ', ' <i>the</i> & 50%\n', 1)))
+    FIELDS.append((field_name, 'utf-8',
+                   field.replace('e', '\xc3\xa9', 1)))
+
+RE_ALLOWED_XML_1_0_CHARS = re.compile(
+    u'[^\U00000009\U0000000A\U0000000D\U00000020-'
+    u'\U0000D7FF\U0000E000-\U0000FFFD\U00010000-\U0010FFFF]')
+
+
+def legacy_encode_for_xml(text, wash=False):
+    """``encode_for_xml`` before the shared escaping engine."""
+    text = text.replace('&', '&amp;')
+    text = text.replace('<', '&lt;')
+    if wash:
+        text = RE_ALLOWED_XML_1_0_CHARS.sub(
+            '', unicode(text, 'utf-8')).encode('utf-8')
+    return text
+
+
+LATEX_ESCAPES = {
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\~{}',
+    '^': r'\^{}',
+    '\\': r'\textbackslash{}',
+}
+
+PUNCTUATION = re.compile(r'[\t !"#$%&\'()*\-/<=>?@\[\\\]^_`{|},.]+')
+
+
+def legacy_escape_latex(text):
+    """Per-character ``escape_latex`` used before the compiled pattern."""
+    text = unicode(text.decode('utf-8'))
+    escaped = "".join([LATEX_ESCAPES.get(char, char) for char in text])
+    return escaped.encode('utf-8')
+
+
+def legacy_remove_line_breaks(text):
+    """``remove_line_breaks`` used before the byte-level translation."""
+    return unicode(text, 'utf-8').replace('\f', '').replace('\n', '') \
+        .replace('\r', '').replace(u'\xe2\x80\xa8', '') \
+        .replace(u'\xe2\x80\xa9', '').replace(u'\xc2\x85', '') \
+        .encode('utf-8')
+
+
+def legacy_slugify(text, delim=u'-'):
+    """``slugify`` used before the translation table for ASCII text."""
+    result = []
+    for word in PUNCTUATION.split(text.lower()):
+        result.extend(unidecode(word).split())
+    return unicode(delim.join(result))
+
+
+CASES = [
+    ('encode_for_xml', legacy_encode_for_xml, encode_for_xml),
+    ('encode_for_xml wash',
+     lambda text: legacy_encode_for_xml(text, wash=True),
+     lambda text: encode_for_xml(text, wash=True)),
+    ('escape_latex', legacy_escape_latex, escape_latex),
+    ('remove_line_breaks', legacy_remove_line_breaks, remove_line_breaks),
+    ('slugify', lambda text: legacy_slugify(text.decode('utf-8')),
+     lambda text: slugify(text.decode('utf-8'))),
+]
+
+
+def measure(function, text):
+    """Return the best time of a call in microseconds."""
+    return min(timeit.repeat(lambda: function(text), number=NUMBER,
+                             repeat=3)) / NUMBER * 1e6
+
+
+def main():
+    """Print the benchmark table."""
+    print('{0:<20} {1:<9} {2:<7} {3:>10} {4:>11}'.format(
+        'function', 'field', 'content', 'legacy us', 'current us'))
+    for name, legacy, current in CASES:
+        for field_name, content, field in FIELDS:
+            print('{0:<20} {1:<9} {2:<7} {3:>10.2f} {4:>11.2f}'.format(
+                name, field_name, content, measure(legacy, field),
+                measure(current, field)))
+
+
+if __name__ == '__main__':
+    main()
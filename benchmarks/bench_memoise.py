@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Benchmark the per-call overhead of memoised functions.
+
+Usage: ``python benchmarks/bench_memoise.py``
+
+The first table compares the key builders.  The second one times complete
+calls of functions decorated with the original ``memoize`` and the current
+one: a hit repeats the same arguments, a miss adds a new argument on every
+call.
+"""
+
+from __future__ import print_function
+
+import functools
+import itertools
+import timeit
+
+from invenio_utils.memoise import make_key, memoize
+
+NUMBER = 100000
+
+CASES = [
+    ('small ints', (1, 2, 3), {}),
+    ('kwargs', ('title', ), {'ln': 'en', 'recid': 12345}),
+    ('long string', ('x' * 10000, ), {}),
+    ('dict arg', ({'collection': 'Articles', 'rg': 10}, ), {}),
+]
+
+
+def legacy_key(args, kwargs):
+    """Key builder used by ``memoize`` before structural keys."""
+    return str(args) + str(kwargs)
+
+
+def legacy_memoize(obj):
+    """``memoize`` decorator before the bounded caches."""
+    cache = obj.cache = {}
+
+    @functools.wraps(obj)
+    def memoizer(*args, **kwargs):
+        key = str(args) + str(kwargs)
+        if key not in cache:
+            cache[key] = obj(*args, **kwargs)
+        return cache[key]
+    return memoizer
+
+
+def function(*args, **kwargs):
+    """Return the first argument, the function being memoised."""
+    return args[0]
+
+
+def measure(call):
+    """Return the best time of a call in microseconds."""
+    return min(timeit.repeat(call, number=NUMBER, repeat=3)) / NUMBER * 1e6
+
+
+def main():
+    """Print the time per call of the key builders and memoised calls."""
+    print('{0:<12} {1:>12} {2:>12}'.format('case', 'legacy us', 'make_key us'))
+    for name, args, kwargs in CASES:
+        row = [name]
+        for builder in (legacy_key, make_key):
+            seconds = min(timeit.repeat(
+                lambda: builder(args, kwargs), number=NUMBER, repeat=3))
+            row.append(seconds / NUMBER * 1e6)
+        print('{0:<12} {1:>12.3f} {2:>12.3f}'.format(*row))
+
+    print()
+    print('{0:<12} {1:>12} {2:>12} {3:>12} {4:>12}'.format(
+        'case', 'legacy hit', 'legacy miss', 'hit us', 'miss us'))
+    for name, args, kwargs in CASES:
+        row = [name]
+        for decorator in (legacy_memoize, memoize):
+            memoised = decorator(function)
+            memoised(*args, **kwargs)
+            row.append(measure(lambda: memoised(*args, **kwargs)))
+            counter = itertools.count()
+            row.append(measure(
+                lambda: memoised(next(counter), *args, **kwargs)))
+        print('{0:<12} {1:>12.3f} {2:>12.3f} {3:>12.3f} {4:>12.3f}'.format(
+            *row))
+
+
+if __name__ == '__main__':
+    main()
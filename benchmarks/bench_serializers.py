@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Benchmark serializer codecs on record-like payloads.
+
+Usage: ``python benchmarks/bench_serializers.py``
+
+For every payload size the table shows the blob size and the time needed to
+serialize and deserialize it with each codec.  It is used to choose the
+defaults of :class:`invenio_utils.serializers.CompressionPolicy`.
+"""
+
+from __future__ import print_function
+
+import random
+import timeit
+
+from invenio_utils.serializers import Framed
+
+CANDIDATES = [
+    ('pickle', None),
+    ('zlib-pickle', 1),
+    ('zlib-pickle', 6),
+    ('lzma-pickle', 6),
+]
+
+WORDS = ('quark gluon boson lepton hadron collider detector luminosity '
+         'neutrino muon electron photon symmetry gauge field theory').split()
+
+
+def make_record(recid, rnd):
+    """Return a dictionary resembling a bibliographic record."""
+    return {
+        'recid': recid,
+        'title': ' '.join(rnd.choice(WORDS) for dummy in range(8)),
+        'authors': ['{0}, {1}.'.format(rnd.choice(WORDS).title(),
+                                       rnd.choice('ABCDEFGH'))
+                    for dummy in range(rnd.randint(1, 20))],
+        'abstract': ' '.join(rnd.choice(WORDS) for dummy in range(120)),
+        'keywords': rnd.sample(WORDS, 5),
+        'year': rnd.randint(1950, 2015),
+        'citations': [rnd.randint(1, 2000000) for dummy in range(30)],
+    }
+
+
+def payloads():
+    """Yield ``(name, obj)`` of increasing size."""
+    rnd = random.Random(42)
+    yield 'recid list 5', [rnd.randint(1, 2000000) for dummy in range(5)]
+    yield 'short dict', {'recid': 1, 'title': 'gauge field theory'}
+    yield 'record', make_record(1, rnd)
+    yield '10 records', [make_record(i, rnd) for i in range(10)]
+    yield '1000 records', [make_record(i, rnd) for i in range(1000)]
+
+
+def measure(function, number):
+    """Return the best time of a call in microseconds."""
+    return min(timeit.repeat(function, number=number, repeat=3)) / \
+        number * 1e6
+
+
+def main():
+    """Print the benchmark table."""
+    print('{0:<14} {1:<14} {2:>10} {3:>12} {4:>12}'.format(
+        'payload', 'codec', 'bytes', 'dumps us', 'loads us'))
+    for name, obj in payloads():
+        number = 3 if name.startswith('1000') else 1000
+        for codec, level in CANDIDATES:
+            blob = Framed.dumps(obj, codec=codec, level=level)
+            dumps_time = measure(
+                lambda: Framed.dumps(obj, codec=codec, level=level), number)
+            loads_time = measure(lambda: Framed.loads(blob), number)
+            label = codec if level is None else '{0}/{1}'.format(codec, level)
+            print('{0:<14} {1:<14} {2:>10} {3:>12.1f} {4:>12.1f}'.format(
+                name, label, len(blob), dumps_time, loads_time))
+
+
+if __name__ == '__main__':
+    main()
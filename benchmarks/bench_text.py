@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Benchmark text utilities on abstract-like payloads.
+
+Usage: ``python benchmarks/bench_text.py``
+"""
+
+from __future__ import print_function
+
+import re
+import timeit
+
+from invenio_utils import text
+
+NUMBER = 200
+
+ABSTRACTS = [
+    ('plain', 'We present a measurement of the top quark mass. ' * 20),
+    ('latex', 'We study $B^0 \\to K^{*0} \\mu^+ \\mu^-$ decays with '
+              '$\\sigma \\approx 5 \\pm 1$ pb, G\\"odel, Erd\\H{o}s and '
+              '$\\Lambda_{QCD}$ at $\\sqrt{s} = 7$ TeV. ' * 20),
+]
+
+
+def legacy_symbols():
+    """Return the alternation of the KB symbols used before the trie."""
+    return re.compile('|'.join(
+        re.escape(line.decode('utf-8').split('|--|')[0])
+        for line in open(text.get_kb_filename())))
+
+
+def legacy_translate_latex2unicode(astring, symbols):
+    """Per-symbol ``translate_latex2unicode`` used before the single pass."""
+    astring = astring.decode('utf-8')
+    table = text.CFG_LATEX_UNICODE_TRANSLATION_CONST['table']
+    for match in symbols.finditer(astring):
+        astring = re.sub("[\{\$]?%s[\}\$]?" % (re.escape(match.group()),),
+                         lambda dummy: table[match.group()], astring)
+    return astring
+
+
+def measure(function, number=NUMBER):
+    """Return the best time of a call in microseconds."""
+    return min(timeit.repeat(function, number=number, repeat=3)) / \
+        number * 1e6
+
+
+def main():
+    """Print the benchmark table."""
+    text.translate_latex2unicode('')
+    symbols = legacy_symbols()
+    print('{0:<26} {1:<8} {2:>12} {3:>12}'.format(
+        'function', 'payload', 'legacy us', 'current us'))
+    for name, abstract in ABSTRACTS:
+        print('{0:<26} {1:<8} {2:>12.1f} {3:>12.1f}'.format(
+            'translate_latex2unicode', name,
+            measure(lambda: legacy_translate_latex2unicode(abstract, symbols)),
+            measure(lambda: text.translate_latex2unicode(abstract))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Benchmark the creation of the links of a result page.
+
+Usage: ``python benchmarks/bench_url.py``
+
+Every page has 10000 links which only differ in the record identifier.
+The table shows the time needed to render a page with the original
+``create_html_link``, the current one, and ``URLTemplate`` writing either
+one string per link or into a single buffer per page.
+"""
+
+from __future__ import print_function
+
+import timeit
+from cgi import escape
+from urllib import quote
+
+from invenio_utils.text import wash_for_utf8
+from invenio_utils.url import URLTemplate, create_html_link
+
+NUMBER = 3
+
+LINKS = 10000
+
+SITE_URL = 'http://inspirehep.net'
+
+PAGES = [
+    ('record', SITE_URL + '/record', {'ln': 'en'}, None),
+    ('search', SITE_URL + '/search',
+     {'p': 'find a ellis and t "higgs boson"', 'of': 'hb', 'ln': 'en',
+      'rg': 25, 'sf': 'earliestdate', 'so': 'd', 'cc': 'HEP'}, None),
+    ('attributes', SITE_URL + '/search', {'of': 'hd', 'ln': 'en'},
+     {'class': 'titlelink', 'title': 'Detailed record'}),
+]
+
+
+def legacy_create_url(urlbase, urlargd, escape_urlargd=True, urlhash=None):
+    """``create_url`` used before the cached argument quoting."""
+    separator = '&amp;'
+    output = urlbase
+    if urlargd:
+        output += '?'
+        if escape_urlargd:
+            arguments = [escape(quote(str(key)), quote=True) + '=' +
+                         escape(quote(str(urlargd[key])), quote=True)
+                         for key in urlargd.keys()]
+        else:
+            arguments = [str(key) + '=' + str(urlargd[key])
+                         for key in urlargd.keys()]
+        output += separator.join(arguments)
+    if urlhash:
+        output += "#" + escape(quote(str(urlhash)))
+    return output
+
+
+def legacy_create_html_link(urlbase, urlargd, link_label, linkattrd=None):
+    """``create_html_link`` used before the cached argument quoting."""
+    output = '<a href="' + legacy_create_url(urlbase, urlargd) + '"'
+    if linkattrd:
+        output += ' '
+        attributes = [escape(str(key), quote=True) + '="' +
+                      escape(str(linkattrd[key]), quote=True) + '"'
+                      for key in linkattrd.keys()]
+        output += ' '.join(attributes)
+    output = wash_for_utf8(output)
+    output += '>' + wash_for_utf8(link_label) + '</a>'
+    return output
+
+
+def render_with(function, urlbase, urlargd, linkattrd):
+    """Return a page rendered with a ``create_html_link`` function."""
+    def render():
+        links = []
+        for recid in range(1, LINKS + 1):
+            arguments = dict(urlargd, recid=recid)
+            links.append(function(urlbase, arguments, 'Record %d' % recid,
+                                  linkattrd))
+        return '\n'.join(links)
+    return render
+
+
+def render_template(urlbase, urlargd, linkattrd):
+    """Return a page rendered with ``URLTemplate.html_link``."""
+    def render():
+        template = URLTemplate(urlbase, urlargd, ('recid', ), linkattrd)
+        return '\n'.join([template.html_link({'recid': recid},
+                                             'Record %d' % recid)
+                          for recid in range(1, LINKS + 1)])
+    return render
+
+
+def render_buffer(urlbase, urlargd, linkattrd):
+    """Return a page rendered with ``URLTemplate.write_html_link``."""
+    def render():
+        template = URLTemplate(urlbase, urlargd, ('recid', ), linkattrd)
+        buffer = []
+        separator = ''
+        for recid in range(1, LINKS + 1):
+            buffer.append(separator)
+            template.write_html_link(buffer, {'recid': recid},
+                                     'Record %d' % recid)
+            separator = '\n'
+        return ''.join(buffer)
+    return render
+
+
+def main():
+    """Print the benchmark table."""
+    print('{0:<11} {1:>10} {2:>10} {3:>10} {4:>10}'.format(
+        'page', 'legacy ms', 'current ms', 'template', 'buffer'))
+    for name, urlbase, urlargd, linkattrd in PAGES:
+        renderers = [
+            render_with(legacy_create_html_link, urlbase, urlargd, linkattrd),
+            render_with(create_html_link, urlbase, urlargd, linkattrd),
+            render_template(urlbase, urlargd, linkattrd),
+            render_buffer(urlbase, urlargd, linkattrd),
+        ]
+        pages = set(render() for render in renderers)
+        assert len(pages) == 1, 'the renderers differ'
+        row = [name]
+        for render in renderers:
+            row.append(min(timeit.repeat(render, number=NUMBER, repeat=3)) /
+                       NUMBER * 1e3)
+        print('{0:<11} {1:>10.1f} {2:>10.1f} {3:>10.1f} {4:>10.1f}'.format(
+            *row))
+
+
+if __name__ == '__main__':
+    main()
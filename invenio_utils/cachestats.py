@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Registry of the in-process caches and their statistics.
+
+The module has no dependencies, so that any data structure can register
+its cache without importing :mod:`invenio_utils.memoise`.
+"""
+
+import sys
+import weakref
+
+import six
+
+#: Registered caches and their names.
+_CACHES = weakref.WeakKeyDictionary()
+
+
+def register_cache(cache, owner):
+    """Register a cache so that it is reported by :func:`dump_cache_stats`.
+
+    :param cache: object with a ``cache_stats()`` method returning a
+        dictionary like :meth:`.memoise.BaseCache.cache_stats`
+    :param owner: name of the cache or the function whose results it holds
+    :return: the cache
+    """
+    if not isinstance(owner, six.string_types):
+        owner = '{0}.{1}'.format(getattr(owner, '__module__', None),
+                                 getattr(owner, '__name__', repr(owner)))
+    _CACHES[cache] = owner
+    return cache
+
+
+def dump_cache_stats():
+    """Return statistics of all registered caches sorted by name.
+
+    Each item is a dictionary with the cache ``name``, the number of
+    ``hits``, ``misses`` and ``evictions``, the number of ``entries``, the
+    approximate ``memory`` footprint in bytes and the cumulative
+    ``time_saved`` in seconds by serving hits instead of recomputing them.
+    """
+    stats = []
+    for cache, name in list(_CACHES.items()):
+        cache_stats = cache.cache_stats()
+        cache_stats['name'] = name
+        stats.append(cache_stats)
+    return sorted(stats, key=lambda cache_stats: cache_stats['name'])
+
+
+def approximate_size(obj, depth=3):
+    """Return the approximate memory footprint of obj in bytes.
+
+    Containers are followed down to the given depth.
+    """
+    size = sys.getsizeof(obj)
+    if depth:
+        depth -= 1
+        if isinstance(obj, dict):
+            size += sum(approximate_size(key, depth) +
+                        approximate_size(value, depth)
+                        for key, value in six.iteritems(obj))
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            size += sum(approximate_size(item, depth) for item in obj)
+    return size
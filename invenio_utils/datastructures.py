@@ -19,10 +19,13 @@
 """Invenio special data structures."""
 
 import re
+import time
 from collections import MutableMapping
 
 from six import iteritems
 
+from invenio_utils.cachestats import approximate_size, register_cache
+
 
 class LazyDict(object):
 
@@ -49,14 +52,23 @@ class LazyDict(object):
         super(LazyDict, self).__init__()
         self._cached_dict = None
         self._function = function
+        self._hits = self._misses = 0
+        self._cost = self._time_saved = 0.0
+        register_cache(self, function)
 
     def _evaluate_function(self):
+        start = time.time()
         self._cached_dict = self._function()
+        self._cost = time.time() - start
+        self._misses += 1
 
     def __getitem__(self, key):
         """Return item from cache if it exists else create it."""
         if self._cached_dict is None:
             self._evaluate_function()
+        else:
+            self._hits += 1
+            self._time_saved += self._cost
         return self._cached_dict.__getitem__(key)
 
     def __setitem__(self, key, value):
@@ -100,6 +112,15 @@ class LazyDict(object):
     def expunge(self):
         self._cached_dict = None
 
+    def cache_stats(self):
+        """Return statistics used by :func:`.cachestats.dump_cache_stats`."""
+        cached_dict = self._cached_dict
+        return dict(hits=self._hits, misses=self._misses, evictions=0,
+                    entries=len(cached_dict) if cached_dict is not None else 0,
+                    memory=approximate_size(cached_dict)
+                    if cached_dict is not None else 0,
+                    time_saved=self._time_saved)
+
     def get(self, key, default=None):
         try:
             return self.__getitem__(key)
@@ -135,6 +156,7 @@ class LaziestDict(LazyDict):
             dictionary) and returns the element which will be store that key.
         """
         super(LaziestDict, self).__init__(function)
+        self._costs = {}
 
     def _evaluate_function(self):
         """Create empty dict if necessary."""
@@ -145,10 +167,16 @@ class LaziestDict(LazyDict):
         if self._cached_dict is None:
             self._evaluate_function()
         if key not in self._cached_dict:
+            self._misses += 1
+            start = time.time()
             try:
                 self._cached_dict.__setitem__(key, self._function(key))
             except:
                 raise KeyError(key)
+            self._costs[key] = time.time() - start
+        else:
+            self._hits += 1
+            self._time_saved += self._costs.get(key, 0.0)
         return self._cached_dict.__getitem__(key)
 
     def __contains__(self, key):
@@ -21,33 +21,651 @@
 Memoisation utilities.
 """
 import functools
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
 
+import six
+from six.moves import cPickle as pickle
 
-class Memoise:
+from invenio_utils.cachestats import approximate_size, dump_cache_stats, \
+    register_cache
+from invenio_utils.serializers import SerializerError, ZlibPickle
+
+#: Default maximum number of entries kept by memoised functions.
+CFG_MEMOISE_DEFAULT_MAXSIZE = 1024
+
+CacheInfo = namedtuple('CacheInfo',
+                       ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+_MISSING = object()
+_KWARGS_MARK = object()
+
+# fields of the links of LRUCache
+_PREVIOUS, _NEXT, _KEY, _VALUE, _EXPIRES, _COST = range(6)
+
+
+def freeze(value):
+    """Return a hashable equivalent of a possibly unhashable value.
+
+    Dictionaries, lists and sets are converted recursively to tuples and
+    frozensets tagged with their type, so that ``[1]`` and ``(1, )`` do not
+    produce the same key.  Any other unhashable value is represented by its
+    ``repr``.
+    """
+    if isinstance(value, dict):
+        items = [(freeze(k), freeze(v)) for k, v in value.items()]
+        try:
+            items.sort()
+        except TypeError:
+            items.sort(key=repr)
+        return (dict, tuple(items))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(freeze(item) for item in value))
+    if isinstance(value, (set, frozenset)):
+        return (frozenset, frozenset(freeze(item) for item in value))
+    try:
+        hash(value)
+    except TypeError:
+        return (type(value), repr(value))
+    return value
+
+
+def make_key(args, kwargs, fallback=freeze):
+    """Build a cache key from positional and keyword arguments.
+
+    The key is the tuple of the arguments followed by the sorted keyword
+    arguments and by the types of all argument values, so that equal
+    arguments of different types such as ``1``, ``1.0`` and ``True`` or
+    ``'a'`` and ``u'a'`` get different keys (like
+    ``functools.lru_cache(typed=True)``).  When some argument is not
+    hashable, every argument is passed through the ``fallback`` function
+    which must return a hashable value.
+    """
+    key = args
+    types = tuple(map(type, args))
+    if kwargs:
+        items = tuple(sorted(kwargs.items()))
+        key += (_KWARGS_MARK, ) + items
+        types += tuple(type(value) for dummy, value in items)
+    try:
+        hash(key)
+    except TypeError:
+        key = tuple(fallback(item) for item in key)
+    return key + types
+
+
+class BaseCache(object):
+
+    """Common interface of the storage backends used for memoisation.
+
+    Subclasses implement ``_lookup``, ``_store``, ``_clear``, ``_memory``
+    and ``__len__``; locking and hit/miss accounting are handled here.
+    Every entry remembers how long it took to compute, so that hits can be
+    accounted as time saved.
+    """
+
+    def __init__(self, maxsize=CFG_MEMOISE_DEFAULT_MAXSIZE, ttl=None,
+                 timer=time.time):
+        """Initialise the cache.
+
+        :param maxsize: maximum number of entries, ``None`` for no limit
+        :param ttl: number of seconds an entry stays valid, ``None`` for
+            entries that never expire
+        :param timer: function returning the current time in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._lock = threading.RLock()
+        self._hits = self._misses = self._evictions = 0
+        self._time_saved = 0.0
+
+    def _lookup(self, key):
+        """Return ``(found, value, cost)`` for key.
+
+        Must be called with the lock held.
+        """
+        raise NotImplementedError
+
+    def _store(self, key, value, expires, cost):
+        """Store value and return the number of evicted entries.
+
+        Must be called with the lock held.
+        """
+        raise NotImplementedError
+
+    def _memory(self):
+        """Return the approximate size of the stored entries in bytes.
+
+        Must be called with the lock held.
+        """
+        raise NotImplementedError
+
+    def _clear(self):
+        """Remove all entries.
+
+        Must be called with the lock held.
+        """
+        raise NotImplementedError
+
+    def get(self, key, default=None):
+        """Return the cached value for key or default, counting hits."""
+        with self._lock:
+            found, value, cost = self._lookup(key)
+            if found:
+                self._hits += 1
+                self._time_saved += cost
+                return value
+            self._misses += 1
+            return default
+
+    def set(self, key, value, cost=0.0):
+        """Store value under key, evicting the oldest entries if needed.
+
+        :param cost: number of seconds it took to compute the value
+        """
+        expires = None
+        if self.ttl is not None:
+            expires = self.timer() + self.ttl
+        with self._lock:
+            self._evictions += self._store(key, value, expires, cost)
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._clear()
+            self._hits = self._misses = self._evictions = 0
+            self._time_saved = 0.0
+
+    def info(self):
+        """Return a :class:`CacheInfo` with the cache statistics."""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions,
+                             self.maxsize, len(self))
+
+    def cache_stats(self):
+        """Return the statistics reported by :func:`dump_cache_stats`."""
+        with self._lock:
+            return dict(hits=self._hits, misses=self._misses,
+                        evictions=self._evictions, entries=len(self),
+                        memory=self._memory(), time_saved=self._time_saved)
+
+    def __getitem__(self, key):
+        """Return the cached value for key or raise ``KeyError``."""
+        with self._lock:
+            found, value, dummy = self._lookup(key)
+            if not found:
+                raise KeyError(key)
+            return value
+
+    def __setitem__(self, key, value):
+        """Store value under key."""
+        self.set(key, value)
+
+    def __contains__(self, key):
+        """Check if key has a valid entry without counting a hit."""
+        with self._lock:
+            return self._lookup(key)[0]
+
+    def __len__(self):
+        """Return the number of stored entries."""
+        raise NotImplementedError
+
+
+class LRUCache(BaseCache):
+
+    """Bounded, thread-safe mapping with LRU eviction and optional TTL.
+
+    Entries live in a dictionary and the recency order in a circular
+    doubly linked list, as in the pure Python ``functools.lru_cache``.  A
+    hit is a dictionary lookup: the lock is only needed to insert and evict
+    entries, and a hit refreshes the recency order only when the lock is
+    free, so concurrent hits never wait.  Statistics are updated without
+    the lock and may miss concurrent hits.
+
+    Example:
+
+    .. code-block:: python
+
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache['a'] = 1
+        cache['b'] = 2
+        cache['c'] = 3  # evicts 'a', the least recently used entry
+        cache.info()
+        # CacheInfo(hits=0, misses=0, evictions=1, maxsize=2, currsize=2)
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initialise the cache (see :class:`BaseCache`)."""
+        super(LRUCache, self).__init__(*args, **kwargs)
+        # none of the methods called with the lock held takes it again
+        self._lock = threading.Lock()
+        self._data = {}
+        # links are [previous, next, key, value, expires, cost]; the root
+        # link sits between the most and the least recently used entries
+        self._root = root = []
+        root[:] = [root, root, None, None, None, 0.0]
+
+    def get(self, key, default=None):
+        """Return the cached value for key or default, counting hits."""
+        link = self._data.get(key)
+        if link is not None:
+            if link[_EXPIRES] is None or link[_EXPIRES] > self.timer():
+                self._hits += 1
+                self._time_saved += link[_COST]
+                if self._root[_PREVIOUS] is not link and \
+                        self._lock.acquire(False):
+                    try:
+                        if self._data.get(key) is link:
+                            self._refresh(link)
+                    finally:
+                        self._lock.release()
+                return link[_VALUE]
+            with self._lock:
+                if self._data.get(key) is link:
+                    self._remove(link)
+        self._misses += 1
+        return default
+
+    def _refresh(self, link):
+        """Move link to the most recently used position."""
+        link[_PREVIOUS][_NEXT] = link[_NEXT]
+        link[_NEXT][_PREVIOUS] = link[_PREVIOUS]
+        root = self._root
+        last = root[_PREVIOUS]
+        last[_NEXT] = root[_PREVIOUS] = link
+        link[_PREVIOUS] = last
+        link[_NEXT] = root
+
+    def _remove(self, link):
+        """Remove link from the list and its entry from the dictionary."""
+        link[_PREVIOUS][_NEXT] = link[_NEXT]
+        link[_NEXT][_PREVIOUS] = link[_PREVIOUS]
+        del self._data[link[_KEY]]
+
+    def _lookup(self, key):
+        """Return ``(found, value, cost)`` refreshing the LRU order."""
+        link = self._data.get(key)
+        if link is None:
+            return False, None, 0.0
+        if link[_EXPIRES] is not None and link[_EXPIRES] <= self.timer():
+            self._remove(link)
+            return False, None, 0.0
+        self._refresh(link)
+        return True, link[_VALUE], link[_COST]
+
+    def _store(self, key, value, expires, cost):
+        """Store value as the most recently used entry."""
+        link = self._data.get(key)
+        if link is not None:
+            self._remove(link)
+        root = self._root
+        last = root[_PREVIOUS]
+        link = [last, root, key, value, expires, cost]
+        last[_NEXT] = root[_PREVIOUS] = self._data[key] = link
+        evictions = 0
+        if self.maxsize is not None:
+            while len(self._data) > self.maxsize:
+                self._remove(root[_NEXT])
+                evictions += 1
+        return evictions
+
+    def _clear(self):
+        """Remove all entries."""
+        self._data.clear()
+        root = self._root
+        root[:] = [root, root, None, None, None, 0.0]
+
+    def _memory(self):
+        """Return the approximate size of keys and values in bytes."""
+        return sys.getsizeof(self._data) + sum(
+            approximate_size(key) + approximate_size(link[_VALUE])
+            for key, link in six.iteritems(self._data))
+
+    def __delitem__(self, key):
+        """Remove key from the cache."""
+        with self._lock:
+            self._remove(self._data[key])
+
+    def __len__(self):
+        """Return the number of stored entries."""
+        return len(self._data)
+
+
+def _encode_key(value):
+    """Return a canonical string representation of a cache key.
+
+    Tuples, frozensets and types produced by :func:`make_key` and
+    :func:`freeze` are encoded recursively, numbers, strings and ``None``
+    by their ``repr``, any other value by its pickle.
+    """
+    kind = type(value)
+    if kind is tuple:
+        return '(%s)' % (','.join([_encode_key(item) for item in value]), )
+    if kind is frozenset:
+        items = sorted([_encode_key(item) for item in value])
+        return '{%s}' % (','.join(items), )
+    if kind in six.integer_types:
+        return '%d' % (value, )
+    if value is None or kind in (bool, float, complex, bytes,
+                                 six.text_type):
+        return repr(value)
+    if value is _KWARGS_MARK:
+        return '**'
+    if isinstance(value, type):
+        if value in six.integer_types:
+            value = int
+        return '<%s.%s>' % (value.__module__, value.__name__)
+    return 'pickle:%r' % (pickle.dumps(value, 2), )
+
+
+class SQLiteCache(BaseCache):
+
+    """Persistent cache stored in a SQLite database file.
+
+    Values are encoded with one of the serializers from
+    :mod:`invenio_utils.serializers` and survive process restarts.  Every
+    write is a single transaction, so several worker processes on the same
+    node can safely share one file.  When more than ``maxsize`` entries are
+    stored, the least recently used ones are removed.
+
+    Example:
+
+    .. code-block:: python
+
+        cache = SQLiteCache('/var/cache/invenio/citations.db', maxsize=10000)
+        fun = Memoise(get_citation_dict, backend=cache)
+    """
+
+    def __init__(self, path, maxsize=CFG_MEMOISE_DEFAULT_MAXSIZE, ttl=None,
+                 timer=time.time, serializer=ZlibPickle):
+        """Initialise the cache.
+
+        :param path: path of the database file, created if needed
+        :param serializer: object with ``dumps`` and ``loads`` methods, e.g.
+            :class:`~invenio_utils.serializers.ZlibPickle` or
+            :class:`~invenio_utils.serializers.ZlibMarshal`
+
+        See :class:`BaseCache` for the other parameters.
+        """
+        super(SQLiteCache, self).__init__(maxsize=maxsize, ttl=ttl,
+                                          timer=timer)
+        self.path = path
+        self.serializer = serializer
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        """Return a connection, opening a new one after a fork."""
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=60,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            with connection:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS memoise ('
+                    'key BLOB PRIMARY KEY, value BLOB NOT NULL, '
+                    'expires REAL, accessed REAL NOT NULL, cost REAL)')
+                connection.execute(
+                    'CREATE INDEX IF NOT EXISTS memoise_accessed '
+                    'ON memoise (accessed)')
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def _dump_key(key):
+        """Return the database representation of key.
+
+        Unlike a pickle, the representation of equal keys does not depend
+        on the identity of their items, nor on Python 2 integers being
+        ``int`` or ``long``.
+        """
+        return sqlite3.Binary(_encode_key(key).encode('utf-8'))
+
+    def _lookup(self, key):
+        """Return ``(found, value, cost)`` refreshing the access time."""
+        connection = self._connect()
+        dumped_key = self._dump_key(key)
+        now = self.timer()
+        with connection:
+            row = connection.execute(
+                'SELECT value, expires, cost FROM memoise WHERE key = ?',
+                (dumped_key, )).fetchone()
+            if row is None:
+                return False, None, 0.0
+            if row[1] is not None and row[1] <= now:
+                connection.execute('DELETE FROM memoise WHERE key = ?',
+                                   (dumped_key, ))
+                return False, None, 0.0
+            connection.execute('UPDATE memoise SET accessed = ? '
+                               'WHERE key = ?', (now, dumped_key))
+        try:
+            return True, self.serializer.loads(bytes(row[0])), row[2] or 0.0
+        except SerializerError:
+            return False, None, 0.0
+
+    def _store(self, key, value, expires, cost):
+        """Store value and remove the least recently used entries."""
+        connection = self._connect()
+        evictions = 0
+        with connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO memoise VALUES (?, ?, ?, ?, ?)',
+                (self._dump_key(key),
+                 sqlite3.Binary(self.serializer.dumps(value)),
+                 expires, self.timer(), cost))
+            if self.maxsize is not None:
+                count = connection.execute(
+                    'SELECT COUNT(*) FROM memoise').fetchone()[0]
+                if count > self.maxsize:
+                    evictions = count - self.maxsize
+                    connection.execute(
+                        'DELETE FROM memoise WHERE key IN (SELECT key '
+                        'FROM memoise ORDER BY accessed LIMIT ?)',
+                        (evictions, ))
+        return evictions
+
+    def _clear(self):
+        """Remove all entries."""
+        connection = self._connect()
+        with connection:
+            connection.execute('DELETE FROM memoise')
+
+    def _memory(self):
+        """Return the size of the stored keys and values in bytes."""
+        return self._connect().execute(
+            'SELECT COALESCE(SUM(LENGTH(key) + LENGTH(value)), 0) '
+            'FROM memoise').fetchone()[0]
+
+    def __len__(self):
+        """Return the number of stored entries."""
+        with self._lock:
+            return self._connect().execute(
+                'SELECT COUNT(*) FROM memoise').fetchone()[0]
+
+
+class SingleFlightTimeout(Exception):
+
+    """Waiting for a computation running in another thread timed out."""
+
+    pass
+
+
+class _Call(object):
+
+    """Result of a computation shared by concurrent callers."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+
+    """Run at most one computation per key at the same time.
+
+    Concurrent callers asking for a key that is being computed wait for the
+    running computation and receive its result or its exception.
+
+    Example:
+
+    .. code-block:: python
+
+        flight = SingleFlight()
+        value = flight.do(recid, lambda: fetch_metadata(recid), timeout=30)
+    """
+
+    def __init__(self):
+        """Initialise the table of running computations."""
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function, timeout=None):
+        """Return ``function()`` sharing the call with concurrent callers.
+
+        :param key: identifier of the computation
+        :param function: callable without arguments computing the value
+        :param timeout: maximum number of seconds to wait for a computation
+            started by another caller, ``None`` to wait forever
+        :raises SingleFlightTimeout: when the other computation did not
+            finish in time
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.event.wait(timeout):
+                raise SingleFlightTimeout(
+                    'Computation of {0!r} did not finish in {1} seconds'
+                    .format(key, timeout))
+            if call.exc_info is not None:
+                six.reraise(*call.exc_info)
+            return call.value
+
+        try:
+            call.value = function()
+        except BaseException:
+            # waiters re-raise SystemExit, GreenletExit and the like too
+            # instead of returning a value that was never computed
+            call.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.value
+
+
+def _compute(cache, flight, timeout, key, function, args, kwargs):
+    """Compute and store the value of key after a cache miss."""
+    if flight is None:
+        start = time.time()
+        value = function(*args, **kwargs)
+        cache.set(key, value, time.time() - start)
+        return value
+
+    def load():
+        # A previous leader may have stored the value in the meantime.
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        start = time.time()
+        value = function(*args, **kwargs)
+        cache.set(key, value, time.time() - start)
+        return value
+    return flight.do(key, load, timeout=timeout)
+
+
+class Memoise(object):
     """
     Basic memoisation helper.
     Usage: fun = Memoise(fun)
     """
 
-    def __init__(self, function):
-        """Initialise."""
-        self.memo = {}
+    def __init__(self, function, maxsize=CFG_MEMOISE_DEFAULT_MAXSIZE,
+                 ttl=None, single_flight=False, timeout=None, backend=None):
+        """Initialise.
+
+        :param function: function to memoise
+        :param maxsize: maximum number of remembered results
+        :param ttl: number of seconds after which a result is recomputed
+        :param single_flight: if True, concurrent calls with the same
+            arguments wait for a single computation (see
+            :class:`SingleFlight`)
+        :param timeout: maximum number of seconds to wait for a concurrent
+            computation in single flight mode
+        :param backend: storage backend (see :class:`BaseCache`) used
+            instead of an in-memory :class:`LRUCache`; ``maxsize`` and ``ttl``
+            are then taken from the backend
+        """
+        self.memo = backend if backend is not None else LRUCache(
+            maxsize=maxsize, ttl=ttl)
+        register_cache(self.memo, function)
         self.function = function
+        self.flight = SingleFlight() if single_flight else None
+        self.timeout = timeout
 
     def __call__(self, *args):
         """Run and eventually memoise."""
-        if args not in self.memo:
-            self.memo[args] = self.function(*args)
-        return self.memo[args]
+        value = self.memo.get(args, _MISSING)
+        if value is not _MISSING:
+            return value
+        return _compute(self.memo, self.flight, self.timeout,
+                        args, self.function, args, {})
 
+    def cache_clear(self):
+        """Forget all memoised results."""
+        self.memo.clear()
+
+    def cache_info(self):
+        """Return statistics of the underlying cache."""
+        return self.memo.info()
+
+
+def memoize(obj=None, maxsize=CFG_MEMOISE_DEFAULT_MAXSIZE, ttl=None,
+            key=make_key, single_flight=False, timeout=None, backend=None):
+    """Memoise a function taking positional and keyword arguments.
+
+    It can be used both as ``@memoize`` and ``@memoize(maxsize=10, ttl=60)``.
+    The decorated function exposes ``cache_clear()`` and ``cache_info()``.
+
+    :param key: function building the cache key from ``(args, kwargs)``,
+        e.g. ``functools.partial(make_key, fallback=pickle.dumps)`` to change
+        how unhashable arguments are handled (see :func:`make_key`)
+    :param single_flight: if True, concurrent calls with the same arguments
+        wait for a single computation instead of all computing the value
+    :param timeout: maximum number of seconds to wait for a concurrent
+        computation in single flight mode
+    :param backend: storage backend used instead of an in-memory
+        :class:`LRUCache`, e.g. :class:`SQLiteCache`
+    """
+    if obj is None:
+        return functools.partial(memoize, maxsize=maxsize, ttl=ttl, key=key,
+                                 single_flight=single_flight, timeout=timeout,
+                                 backend=backend)
 
-def memoize(obj):
-    cache = obj.cache = {}
+    cache = obj.cache = backend if backend is not None else LRUCache(
+        maxsize=maxsize, ttl=ttl)
+    register_cache(cache, obj)
+    flight = SingleFlight() if single_flight else None
 
     @functools.wraps(obj)
     def memoizer(*args, **kwargs):
-        key = str(args) + str(kwargs)
-        if key not in cache:
-            cache[key] = obj(*args, **kwargs)
-        return cache[key]
+        cache_key = key(args, kwargs)
+        value = cache.get(cache_key, _MISSING)
+        if value is not _MISSING:
+            return value
+        return _compute(cache, flight, timeout, cache_key, obj, args, kwargs)
+    memoizer.cache_clear = cache.clear
+    memoizer.cache_info = cache.info
     return memoizer
@@ -26,13 +26,15 @@ Usage example:
 """
 
 import re
+import time
 from mimetypes import MimeTypes
 from thread import get_ident
 
 from six import iteritems
-from werkzeug import LocalProxy, cached_property
+from werkzeug import LocalProxy
 
 from invenio_base.globals import cfg
+from invenio_utils.cachestats import approximate_size, register_cache
 
 try:
     import magic
@@ -83,9 +85,58 @@ elif CFG_HAS_MAGIC == 2:
         return magic_object.from_file(local_path)  # pylint: disable=E1103
 
 
+class _counted_cached_property(object):
+
+    """Cached property counting its hits and misses.
+
+    Unlike ``werkzeug.cached_property`` the value is not stored in the
+    instance dictionary, so that every access is seen and accounted in
+    the statistics of :class:`LazyMimeCache`.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.__name__ = function.__name__
+        self.__doc__ = function.__doc__
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        try:
+            value, cost = obj._computed[self.__name__]
+        except KeyError:
+            start = time.time()
+            value = self.function(obj)
+            cost = time.time() - start
+            obj._computed[self.__name__] = (value, cost)
+            obj._misses += 1
+            return value
+        obj._hits += 1
+        obj._time_saved += cost
+        return value
+
+
 class LazyMimeCache(object):
 
-    @cached_property
+    def __init__(self):
+        """Register the cache for statistics."""
+        self._computed = {}
+        self._hits = self._misses = 0
+        self._time_saved = 0.0
+        register_cache(self, 'invenio_utils.mimetype.LazyMimeCache')
+
+    def cache_stats(self):
+        """Return statistics used by :func:`.cachestats.dump_cache_stats`."""
+        values = [value for value, dummy in self._computed.values()]
+        return dict(hits=self._hits, misses=self._misses, evictions=0,
+                    entries=len(values),
+                    memory=sum(approximate_size(value.__dict__)
+                               if hasattr(value, '__dict__')
+                               else approximate_size(value)
+                               for value in values),
+                    time_saved=self._time_saved)
+
+    @_counted_cached_property
     def mimes(self):
         """
         Returns extended MimeTypes.
@@ -102,7 +153,7 @@ class LazyMimeCache(object):
 
         return _mimes
 
-    @cached_property
+    @_counted_cached_property
     def extensions(self):
         """
         Generate the regular expression to match all the known extensions.
@@ -17,21 +17,45 @@
 # 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
 """Implements custom serializers."""
 
+import mmap
+import multiprocessing
+import os
+import struct
 import zlib
+from collections import defaultdict
 
 import marshal
+import six
 from backports import lzma
 from six.moves import cPickle as pickle
 
 __all__ = ['ZlibMarshal',
            'ZlibPickle',
            'LzmaPickle',
+           'Framed',
+           'ZlibDictionary',
+           'ZlibDictMarshal',
+           'Adaptive',
+           'CompressionPolicy',
+           'ArchiveReader',
+           'ArchiveWriter',
            'SerializerError',
+           'dumps',
+           'dumps_many',
+           'is_framed',
+           'loads',
+           'loads_many',
            'serialize_via_marshal',
            'deserialize_via_marshal',
            'serialize_via_pickle',
            'deserialize_via_pickle']
 
+try:
+    zlib.compressobj(zdict=b' ')
+    _ZLIB_HAS_ZDICT = True
+except TypeError:
+    _ZLIB_HAS_ZDICT = False
+
 
 class SerializerError(Exception):
 
@@ -40,6 +64,141 @@ class SerializerError(Exception):
     pass
 
 
+#: Size of the chunks written to and read from files by streaming methods.
+CFG_SERIALIZER_CHUNK_SIZE = 1 << 16
+
+
+class _CompressingWriter(object):
+
+    """File-like object compressing everything written into a file."""
+
+    def __init__(self, fileobj, compressor, chunk_size):
+        self.fileobj = fileobj
+        self.compressor = compressor
+        self.chunk_size = chunk_size
+        self._buffer = []
+        self._buffered = 0
+
+    def write(self, data):
+        """Buffer data and compress it once a chunk is complete."""
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.chunk_size:
+            self._compress()
+
+    def _compress(self):
+        self.fileobj.write(self.compressor.compress(b''.join(self._buffer)))
+        self._buffer = []
+        self._buffered = 0
+
+    def close(self):
+        """Compress the remaining data and end the compressed stream."""
+        self._compress()
+        self.fileobj.write(self.compressor.flush())
+
+
+class _DecompressingReader(object):
+
+    """File-like object reading decompressed data from a file.
+
+    Reading stops at the end of the compressed stream, so that several
+    objects can be loaded in sequence from one file.  The compressed data
+    is peeked when the file supports it (e.g. ``io.BufferedReader``) and
+    only the bytes of the stream are consumed; otherwise :meth:`close`
+    seeks back over the bytes read past the end of the stream.
+    """
+
+    def __init__(self, fileobj, decompressor, chunk_size):
+        self.fileobj = fileobj
+        self.decompressor = decompressor
+        self.chunk_size = chunk_size
+        self._peek = getattr(fileobj, 'peek', None)
+        self._buffer = b''
+        self._pos = 0
+        self._eof = False
+        self._unused = b''
+
+    def _fill(self, size=None):
+        """Decompress chunks until size bytes are available (or EOF)."""
+        chunks = [self._buffer[self._pos:]]
+        available = len(chunks[0])
+        while not self._eof and (size is None or available < size):
+            if self._peek is not None:
+                chunk = self._peek(self.chunk_size)[:self.chunk_size]
+            else:
+                chunk = self.fileobj.read(self.chunk_size)
+            if chunk:
+                data = self.decompressor.decompress(chunk)
+                # zlib on Python 2 has no eof attribute, the bytes
+                # following the stream end up in unused_data
+                unused = self.decompressor.unused_data
+                if unused or getattr(self.decompressor, 'eof', False):
+                    self._eof = True
+                if self._peek is not None:
+                    self.fileobj.read(len(chunk) - len(unused))
+                else:
+                    self._unused = unused
+            else:
+                self._eof = True
+                flush = getattr(self.decompressor, 'flush', None)
+                data = flush() if flush is not None else b''
+            chunks.append(data)
+            available += len(data)
+        self._buffer = b''.join(chunks)
+        self._pos = 0
+
+    def close(self):
+        """Read the end of the stream and give back the bytes after it."""
+        self._fill()
+        if self._unused:
+            self.fileobj.seek(-len(self._unused), os.SEEK_CUR)
+            self._unused = b''
+
+    def read(self, size=-1):
+        """Return up to size decompressed bytes."""
+        if size is None or size < 0:
+            self._fill()
+            size = len(self._buffer)
+        elif len(self._buffer) - self._pos < size:
+            self._fill(size)
+        data = self._buffer[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+    def readline(self):
+        """Return the next decompressed line."""
+        end = self._buffer.find(b'\n', self._pos)
+        while end < 0 and not self._eof:
+            searched = len(self._buffer) - self._pos
+            self._fill(searched + self.chunk_size)
+            end = self._buffer.find(b'\n', self._pos + searched)
+        return self.read(end + 1 - self._pos if end >= 0 else -1)
+
+
+def _dump_stream(obj, fileobj, compressor, protocol, chunk_size):
+    """Pickle obj into fileobj through compressor."""
+    writer = _CompressingWriter(fileobj, compressor, chunk_size)
+    pickle.dump(obj, writer, protocol)
+    writer.close()
+
+
+def _load_stream(fileobj, decompressor, errors, chunk_size):
+    """Unpickle an object from fileobj through decompressor."""
+    reader = _DecompressingReader(fileobj, decompressor, chunk_size)
+    try:
+        obj = pickle.load(reader)
+        reader.close()
+        return obj
+    except errors as e:
+        raise SerializerError(
+            'Cannot decompress object ("{}")'.format(str(e))
+        )
+    except (pickle.UnpicklingError, EOFError) as e:
+        raise SerializerError(
+            'Cannot restore object ("{}")'.format(str(e))
+        )
+
+
 class ZlibMarshal(object):
 
     """Combines zlib and marshal libraries."""
@@ -69,6 +228,188 @@ serialize_via_marshal = ZlibMarshal.dumps
 deserialize_via_marshal = ZlibMarshal.loads
 
 
+class ZlibDictionary(object):
+
+    """Preset dictionary for zlib compression of small similar payloads.
+
+    Small payloads compress badly on their own because zlib has no history
+    to refer to.  A dictionary holding substrings common to the payloads
+    fills that history beforehand.  Payloads are compressed as raw deflate
+    streams with the dictionary set through ``zdict``.  On Python versions
+    whose zlib lacks ``zdict`` support, a compressor and a decompressor are
+    primed with the dictionary once and copied for every payload instead;
+    both kinds of strings can be read by either implementation.
+
+    The dictionary is identified by the Adler-32 checksum of its content
+    (like zlib's own ``FDICT`` identifier), so every new version of the
+    dictionary gets a new id.
+    """
+
+    #: zlib can only refer to the last 32 KiB of history.
+    MAX_SIZE = 32768 - 262
+
+    def __init__(self, data, level=6):
+        """Prime compression objects with the dictionary.
+
+        :param data: dictionary content, at most :attr:`MAX_SIZE` bytes are
+            useful
+        :param level: zlib compression level
+        """
+        self.data = data
+        self.level = level
+        self.dict_id = zlib.adler32(data) & 0xffffffff
+        if _ZLIB_HAS_ZDICT:
+            return
+        self._compressor = zlib.compressobj(level)
+        prefix = self._compressor.compress(data) + \
+            self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        self._decompressor = zlib.decompressobj()
+        self._decompressor.decompress(prefix)
+
+    def __reduce__(self):
+        """Pickle the dictionary content, e.g. for :func:`dumps_many`.
+
+        The zlib compression objects cannot be pickled; they are primed
+        again when the dictionary is unpickled.
+        """
+        return self.__class__, (self.data, self.level)
+
+    @classmethod
+    def train(cls, samples, size=16384, ngram=8, min_count=2, level=6):
+        """Build a dictionary from sample payloads.
+
+        Substrings made of ``ngram``-byte sequences found in at least
+        ``min_count`` samples are collected and ranked by the number of
+        samples containing them times their length.  The best ones are
+        placed at the end of the dictionary, where zlib refers to them with
+        the shortest distances, and substrings of better ones are skipped.
+
+        :param samples: serialized payloads similar to the ones to compress
+        :param size: maximal size of the dictionary in bytes
+        """
+        samples = list(samples)
+        counts = defaultdict(int)
+        for sample in samples:
+            for gram in set(sample[i:i + ngram]
+                            for i in range(len(sample) - ngram + 1)):
+                counts[gram] += 1
+
+        substrings = defaultdict(int)
+        for sample in samples:
+            start = None
+            for i in range(len(sample) - ngram + 2):
+                common = i <= len(sample) - ngram and \
+                    counts[sample[i:i + ngram]] >= min_count
+                if common and start is None:
+                    start = i
+                elif not common and start is not None:
+                    substrings[sample[start:i - 1 + ngram]] += 1
+                    start = None
+
+        ranked = sorted(substrings, key=lambda substring: (
+            substrings[substring] * len(substring), substring), reverse=True)
+        size = min(size, cls.MAX_SIZE)
+        selected = []
+        length = 0
+        for substring in ranked:
+            if length >= size:
+                break
+            if not any(substring in better for better in selected):
+                selected.append(substring)
+                length += len(substring)
+        data = b''.join(reversed(selected))
+        return cls(data[len(data) - size:] if len(data) > size else data,
+                   level=level)
+
+    def compress(self, payload):
+        """Compress payload using the dictionary."""
+        if _ZLIB_HAS_ZDICT:
+            compressor = zlib.compressobj(level=self.level,
+                                          wbits=-zlib.MAX_WBITS,
+                                          zdict=self.data)
+        else:
+            compressor = self._compressor.copy()
+        return compressor.compress(payload) + compressor.flush()
+
+    def decompress(self, astring):
+        """Decompress a string produced by :meth:`compress`."""
+        if _ZLIB_HAS_ZDICT:
+            # strings of primed compressors end with an ignored checksum
+            decompressor = zlib.decompressobj(wbits=-zlib.MAX_WBITS,
+                                              zdict=self.data)
+        else:
+            decompressor = self._decompressor.copy()
+        return decompressor.decompress(astring) + decompressor.flush()
+
+
+class ZlibDictMarshal(object):
+
+    """Combines marshal and zlib compression with a preset dictionary.
+
+    Every string starts with the 4-byte id of the dictionary used to
+    compress it.  Strings are written with the first given dictionary and
+    can be read with any of them, which allows to roll out a new version of
+    the dictionary while old data is still around.
+
+    Example:
+
+    .. code-block:: python
+
+        dictionary = ZlibDictionary.train(
+            ZlibDictMarshal.sample(record) for record in sample_records)
+        serializer = ZlibDictMarshal([dictionary])
+        astring = serializer.dumps(record)
+    """
+
+    _DICT_ID = struct.Struct('>I')
+
+    def __init__(self, dictionaries):
+        """Initialise with a sequence of :class:`ZlibDictionary`."""
+        dictionaries = list(dictionaries)
+        if not dictionaries:
+            raise SerializerError('At least one dictionary is required')
+        self.dictionary = dictionaries[0]
+        self.dictionaries = dict((dictionary.dict_id, dictionary)
+                                 for dictionary in dictionaries)
+
+    @staticmethod
+    def sample(obj):
+        """Return the payload of obj to be used for training."""
+        return marshal.dumps(obj)
+
+    def dumps(self, obj):
+        """Serialize Python object via marshal into a compressed string."""
+        return self._DICT_ID.pack(self.dictionary.dict_id) + \
+            self.dictionary.compress(marshal.dumps(obj))
+
+    def loads(self, astring):
+        """Decompress and deserialize string into Python object."""
+        try:
+            dict_id = self._DICT_ID.unpack_from(astring)[0]
+        except struct.error as e:
+            raise SerializerError(
+                'Cannot decompress object ("{}")'.format(str(e))
+            )
+        try:
+            dictionary = self.dictionaries[dict_id]
+        except KeyError:
+            raise SerializerError(
+                'Unknown dictionary id {0:#010x}'.format(dict_id))
+        try:
+            payload = dictionary.decompress(astring[self._DICT_ID.size:])
+        except zlib.error as e:
+            raise SerializerError(
+                'Cannot decompress object ("{}")'.format(str(e))
+            )
+        try:
+            return marshal.loads(payload)
+        except Exception as e:
+            # marshal module does not provide a proper Exception model
+            raise SerializerError(
+                'Cannot restore object ("{}")'.format(str(e))
+            )
+
+
 class ZlibPickle(object):
 
     """Combines zlib and pickle libraries."""
@@ -92,6 +433,33 @@ class ZlibPickle(object):
         """Serialize Python object via pickle into compressed string."""
         return zlib.compress(pickle.dumps(obj))
 
+    @staticmethod
+    def dump(obj, fileobj, protocol=pickle.HIGHEST_PROTOCOL,
+             chunk_size=CFG_SERIALIZER_CHUNK_SIZE):
+        """Serialize Python object via pickle into a compressed file.
+
+        The pickle output is compressed chunk by chunk, so neither the whole
+        pickle nor the whole compressed string is kept in memory.  The
+        written data can be read with :meth:`load` or :meth:`loads`.
+
+        :param fileobj: file-like object open for binary writing
+        """
+        _dump_stream(obj, fileobj, zlib.compressobj(), protocol, chunk_size)
+
+    @staticmethod
+    def load(fileobj, chunk_size=CFG_SERIALIZER_CHUNK_SIZE):
+        """Decompress and deserialize a file into Python object via pickle.
+
+        The file is left at the end of the compressed object, so objects
+        written one after the other by :meth:`dump` are loaded in sequence.
+        Streams that cannot seek must provide a ``peek`` method, e.g. wrap
+        them in ``io.BufferedReader``.
+
+        :param fileobj: file-like object open for binary reading
+        """
+        return _load_stream(fileobj, zlib.decompressobj(), (zlib.error, ),
+                            chunk_size)
+
 # Provides legacy API functions.
 serialize_via_pickle = ZlibPickle.dumps
 deserialize_via_pickle = ZlibPickle.loads
@@ -119,3 +487,495 @@ class LzmaPickle(object):
     def dumps(obj):
         """Serialize Python object via pickle into a compressed string."""
         return lzma.compress(pickle.dumps(obj))
+
+    @staticmethod
+    def dump(obj, fileobj, protocol=pickle.HIGHEST_PROTOCOL,
+             chunk_size=CFG_SERIALIZER_CHUNK_SIZE):
+        """Serialize Python object via pickle into a compressed file.
+
+        See :meth:`ZlibPickle.dump`.
+        """
+        _dump_stream(obj, fileobj, lzma.LZMACompressor(), protocol,
+                     chunk_size)
+
+    @staticmethod
+    def load(fileobj, chunk_size=CFG_SERIALIZER_CHUNK_SIZE):
+        """Decompress and deserialize a file into a Python object via pickle.
+
+        See :meth:`ZlibPickle.load`.
+        """
+        return _load_stream(fileobj, lzma.LZMADecompressor(),
+                            (lzma.LZMAError, ), chunk_size)
+
+
+#: Magic bytes starting every framed blob.
+FRAME_MAGIC = b'\x89IS'
+
+#: Frame header: magic, codec id, protocol and uncompressed length.
+FRAME_HEADER = struct.Struct('>3sBBQ')
+
+#: Legacy lzma blobs are in the xz container format.
+_XZ_MAGIC = b'\xfd7zXZ\x00'
+
+
+def _identity(astring, level=None):
+    """Return the string unchanged."""
+    return astring
+
+
+def _zlib_compress(astring, level=None):
+    """Compress with zlib at the given level (default 6)."""
+    return zlib.compress(astring, 6 if level is None else level)
+
+
+def _lzma_compress(astring, level=None):
+    """Compress with lzma using the given preset (default 6)."""
+    return lzma.compress(astring, preset=level)
+
+
+class _Codec(object):
+
+    """Serialization method and compression of a framed blob."""
+
+    def __init__(self, codec_id, name, method, compress, decompress, errors):
+        self.codec_id = codec_id
+        self.name = name
+        self.method = method
+        self.compress = compress
+        self.decompress = decompress
+        self.errors = errors
+
+
+_CODECS = [
+    _Codec(1, 'pickle', 'pickle', _identity, _identity, ()),
+    _Codec(2, 'marshal', 'marshal', _identity, _identity, ()),
+    _Codec(3, 'zlib-pickle', 'pickle', _zlib_compress, zlib.decompress,
+           (zlib.error, )),
+    _Codec(4, 'zlib-marshal', 'marshal', _zlib_compress, zlib.decompress,
+           (zlib.error, )),
+    _Codec(5, 'lzma-pickle', 'pickle', _lzma_compress, lzma.decompress,
+           (lzma.LZMAError, )),
+    _Codec(6, 'lzma-marshal', 'marshal', _lzma_compress, lzma.decompress,
+           (lzma.LZMAError, )),
+]
+
+#: Codecs indexed by name.
+CODECS = dict((codec.name, codec) for codec in _CODECS)
+
+_CODECS_BY_ID = dict((codec.codec_id, codec) for codec in _CODECS)
+
+
+class Framed(object):
+
+    """Self-describing serializer.
+
+    Every blob starts with a small header (see :data:`FRAME_HEADER`) holding
+    the codec id, the pickle protocol (or marshal version) and the length of
+    the uncompressed payload, so readers do not need to know in advance how
+    a blob was written.  Available codecs are listed in :data:`CODECS`.
+    """
+
+    @staticmethod
+    def dumps(obj, codec='zlib-pickle', protocol=pickle.HIGHEST_PROTOCOL,
+              level=None):
+        """Serialize Python object into a framed string.
+
+        :param codec: name of the codec, e.g. ``'zlib-pickle'``
+        :param protocol: pickle protocol, ignored for marshal codecs
+        :param level: zlib compression level or lzma preset
+        """
+        method = _get_codec(codec).method
+        return Framed.frame(_serialize(obj, method, protocol), codec,
+                            _protocol(method, protocol), level)
+
+    @staticmethod
+    def frame(payload, codec, protocol, level=None):
+        """Compress an already serialized payload and add the header."""
+        codec = _get_codec(codec)
+        return FRAME_HEADER.pack(FRAME_MAGIC, codec.codec_id, protocol,
+                                 len(payload)) + \
+            codec.compress(payload, level)
+
+    @staticmethod
+    def loads(astring):
+        """Deserialize framed string into Python object."""
+        if not is_framed(astring):
+            raise SerializerError('Missing frame header')
+        dummy, codec_id, dummy, length = FRAME_HEADER.unpack_from(astring)
+        try:
+            codec = _CODECS_BY_ID[codec_id]
+        except KeyError:
+            raise SerializerError('Unknown codec id {0}'.format(codec_id))
+        try:
+            payload = codec.decompress(astring[FRAME_HEADER.size:])
+        except codec.errors as e:
+            raise SerializerError(
+                'Cannot decompress object ("{}")'.format(str(e))
+            )
+        if len(payload) != length:
+            raise SerializerError(
+                'Corrupted object (expected {0} bytes, got {1})'.format(
+                    length, len(payload)))
+        try:
+            if codec.method == 'pickle':
+                return pickle.loads(payload)
+            return marshal.loads(payload)
+        except Exception as e:
+            raise SerializerError(
+                'Cannot restore object ("{}")'.format(str(e))
+            )
+
+
+def _get_codec(name):
+    """Return codec by name."""
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise SerializerError('Unknown codec "{0}"'.format(name))
+
+
+def _protocol(method, protocol):
+    """Return the protocol stored in the header for a method."""
+    return protocol if method == 'pickle' else marshal.version
+
+
+def _serialize(obj, method, protocol):
+    """Serialize obj with pickle or marshal."""
+    if method == 'pickle':
+        return pickle.dumps(obj, protocol)
+    return marshal.dumps(obj, marshal.version)
+
+
+def is_framed(astring):
+    """Check if the string was produced by :class:`Framed`."""
+    return astring[:len(FRAME_MAGIC)] == FRAME_MAGIC and \
+        len(astring) >= FRAME_HEADER.size
+
+
+def dumps(obj, codec='zlib-pickle', protocol=pickle.HIGHEST_PROTOCOL):
+    """Serialize Python object into a framed string (see :class:`Framed`)."""
+    return Framed.dumps(obj, codec=codec, protocol=protocol)
+
+
+def loads(astring, legacy=None):
+    """Deserialize a string produced by any serializer of this module.
+
+    Framed strings are decoded according to their header.  Strings without
+    a header are decoded with the ``legacy`` serializer if given, otherwise
+    with :class:`LzmaPickle` or :class:`ZlibPickle` depending on their
+    compression format.
+
+    :param legacy: serializer used for strings without a frame header,
+        e.g. :class:`ZlibMarshal`
+    """
+    if is_framed(astring):
+        return Framed.loads(astring)
+    if legacy is None:
+        if astring[:len(_XZ_MAGIC)] == _XZ_MAGIC:
+            legacy = LzmaPickle
+        else:
+            legacy = ZlibPickle
+    return legacy.loads(astring)
+
+
+class CompressionPolicy(object):
+
+    """Thresholds used by :class:`Adaptive` to choose a codec.
+
+    Payloads smaller than ``min_size`` bytes are stored uncompressed,
+    because compressing them costs time and often makes them bigger.  Larger
+    payloads are compressed with zlib at ``zlib_level``.  Payloads of at
+    least ``lzma_min_size`` bytes written as cold (rarely read) blobs are
+    compressed with lzma at ``lzma_preset``.  The defaults come from
+    ``benchmarks/bench_serializers.py``.
+    """
+
+    def __init__(self, min_size=512, zlib_level=1, lzma_min_size=1 << 20,
+                 lzma_preset=6, method='pickle',
+                 protocol=pickle.HIGHEST_PROTOCOL):
+        """Initialise the policy.
+
+        :param method: ``'pickle'`` or ``'marshal'``
+        :param lzma_min_size: minimal size of cold payloads compressed with
+            lzma, ``None`` to never use lzma
+        """
+        if method not in ('pickle', 'marshal'):
+            raise SerializerError('Unknown method "{0}"'.format(method))
+        self.min_size = min_size
+        self.zlib_level = zlib_level
+        self.lzma_min_size = lzma_min_size
+        self.lzma_preset = lzma_preset
+        self.method = method
+        self.protocol = protocol
+
+    def choose(self, size, cold=False):
+        """Return ``(codec, level)`` for a payload of the given size."""
+        if size < self.min_size:
+            return self.method, None
+        if cold and self.lzma_min_size is not None and \
+                size >= self.lzma_min_size:
+            return 'lzma-' + self.method, self.lzma_preset
+        return 'zlib-' + self.method, self.zlib_level
+
+
+class Adaptive(object):
+
+    """Framed serializer choosing the codec from the payload size.
+
+    Example:
+
+    .. code-block:: python
+
+        serializer = Adaptive(CompressionPolicy(min_size=1024))
+        blob = serializer.dumps(record)
+        record = serializer.loads(blob)
+    """
+
+    def __init__(self, policy=None):
+        """Initialise with a :class:`CompressionPolicy`."""
+        self.policy = policy or CompressionPolicy()
+
+    def dumps(self, obj, cold=False):
+        """Serialize Python object into a framed string.
+
+        :param cold: True for blobs that are rarely read, allowing the
+            slower but tighter lzma compression for large payloads
+        """
+        policy = self.policy
+        payload = _serialize(obj, policy.method, policy.protocol)
+        codec, level = policy.choose(len(payload), cold=cold)
+        return Framed.frame(payload, codec,
+                            _protocol(policy.method, policy.protocol), level)
+
+    @staticmethod
+    def loads(astring):
+        """Deserialize framed string into Python object."""
+        return Framed.loads(astring)
+
+
+#: Magic bytes starting and ending every archive.
+ARCHIVE_MAGIC = b'\x89IA\x01'
+
+#: Archive footer: offset and length of the index, magic.
+ARCHIVE_FOOTER = struct.Struct('>QQ4s')
+
+
+class ArchiveWriter(object):
+
+    """Write many independently serialized objects into one file.
+
+    Objects are appended one after another and followed by an index of
+    their offsets, so that :class:`ArchiveReader` can read any of them
+    without touching the others.  The archive is written to a temporary
+    file renamed to ``path`` on :meth:`close`, so readers never see a
+    partial archive.
+
+    Example:
+
+    .. code-block:: python
+
+        with ArchiveWriter('/tmp/records.arc') as archive:
+            for recid, record in records:
+                archive.add(recid, record)
+    """
+
+    def __init__(self, path, serializer=None):
+        """Open the archive for writing.
+
+        :param path: path of the archive
+        :param serializer: object whose ``dumps`` produces framed strings,
+            :class:`Adaptive` by default
+        """
+        self.path = path
+        self.serializer = serializer or Adaptive()
+        self._tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(ARCHIVE_MAGIC)
+        self._offset = len(ARCHIVE_MAGIC)
+        self._index = {}
+
+    def add(self, key, obj):
+        """Append obj stored under key (a later key replaces an earlier)."""
+        blob = self.serializer.dumps(obj)
+        self._file.write(blob)
+        self._index[key] = (self._offset, len(blob))
+        self._offset += len(blob)
+
+    def close(self):
+        """Write the index and move the archive to its final path."""
+        if self._file is None:
+            return
+        index = Framed.dumps(self._index, codec='zlib-pickle')
+        self._file.write(index)
+        self._file.write(ARCHIVE_FOOTER.pack(self._offset, len(index),
+                                             ARCHIVE_MAGIC))
+        self._file.close()
+        self._file = None
+        os.rename(self._tmp_path, self.path)
+
+    def abort(self):
+        """Discard the archive being written."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ArchiveReader(object):
+
+    """Read objects from an archive written by :class:`ArchiveWriter`.
+
+    The file is memory-mapped: :meth:`get` decompresses only the requested
+    object and iteration reads the objects sequentially in file order.
+    """
+
+    def __init__(self, path, serializer=None):
+        """Open the archive.
+
+        :param serializer: object with a ``loads`` method, by default the
+            universal :func:`loads`
+        """
+        self.path = path
+        self._loads = serializer.loads if serializer is not None else loads
+        with open(path, 'rb') as fileobj:
+            # mmap refuses empty files, which are not archives anyway
+            if not os.fstat(fileobj.fileno()).st_size:
+                raise SerializerError('"{0}" is not an archive'.format(path))
+            self._mmap = mmap.mmap(fileobj.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        size = len(self._mmap)
+        if size < len(ARCHIVE_MAGIC) + ARCHIVE_FOOTER.size or \
+                self._mmap[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+            self.close()
+            raise SerializerError('"{0}" is not an archive'.format(path))
+        offset, length, magic = ARCHIVE_FOOTER.unpack(
+            self._mmap[size - ARCHIVE_FOOTER.size:])
+        if magic != ARCHIVE_MAGIC:
+            self.close()
+            raise SerializerError('"{0}" is truncated'.format(path))
+        self._index = Framed.loads(self._mmap[offset:offset + length])
+
+    def get(self, key, default=None):
+        """Return the object stored under key or default."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __getitem__(self, key):
+        """Return the object stored under key."""
+        offset, length = self._index[key]
+        return self._loads(self._mmap[offset:offset + length])
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def keys(self):
+        """Return the stored keys."""
+        return list(self._index)
+
+    def iteritems(self):
+        """Yield ``(key, obj)`` pairs in the order they were written."""
+        for key, (offset, length) in sorted(
+                self._index.items(), key=lambda item: item[1][0]):
+            yield key, self._loads(self._mmap[offset:offset + length])
+
+    def close(self):
+        """Unmap the archive."""
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _dumps_one(args):
+    """Serialize ``(obj, codec)`` in a worker process."""
+    obj, codec = args
+    if isinstance(codec, six.string_types):
+        return Framed.dumps(obj, codec=codec)
+    return codec.dumps(obj)
+
+
+def _loads_one(args):
+    """Deserialize ``(astring, serializer)`` in a worker process."""
+    astring, serializer = args
+    if serializer is None:
+        return loads(astring)
+    return serializer.loads(astring)
+
+
+def _map(function, items, workers, chunksize, pool):
+    """Apply function to items in a process pool keeping their order."""
+    if pool is None and workers is None:
+        workers = multiprocessing.cpu_count()
+    if pool is None and (workers <= 1 or len(items) <= 1):
+        return [function(item) for item in items]
+    if chunksize is None:
+        # A few chunks per worker balance the load without paying the
+        # inter-process round trip for every object.
+        processes = workers or multiprocessing.cpu_count()
+        chunksize = max(1, len(items) // (processes * 4))
+    if pool is not None:
+        return pool.map(function, items, chunksize)
+    pool = multiprocessing.Pool(workers)
+    try:
+        return pool.map(function, items, chunksize)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def dumps_many(objs, codec='zlib-pickle', workers=None, chunksize=None,
+               pool=None):
+    """Serialize many objects in parallel.
+
+    Compression runs in a pool of worker processes; the objects are pickled
+    to be sent to the workers, so this pays off for CPU-bound codecs and
+    large batches.  Batches of one object or ``workers=1`` are serialized
+    in the current process.
+
+    :param objs: iterable of objects
+    :param codec: codec name for :meth:`Framed.dumps` or an object with a
+        ``dumps`` method, e.g. :class:`ZlibPickle` or :class:`Adaptive`
+    :param workers: number of processes, the number of CPUs by default
+    :param chunksize: number of objects sent to a worker at once, by
+        default the batch is split in four chunks per worker
+    :param pool: existing :class:`multiprocessing.Pool` to use
+    :return: list of strings in the order of ``objs``
+    """
+    return _map(_dumps_one, [(obj, codec) for obj in objs], workers,
+                chunksize, pool)
+
+
+def loads_many(astrings, serializer=None, workers=None, chunksize=None,
+               pool=None):
+    """Deserialize many strings in parallel.
+
+    :param astrings: iterable of strings
+    :param serializer: object with a ``loads`` method, by default the
+        universal :func:`loads`
+
+    See :func:`dumps_many` for the other parameters.
+
+    :return: list of objects in the order of ``astrings``
+    """
+    return _map(_loads_one, [(astring, serializer) for astring in astrings],
+                workers, chunksize, pool)
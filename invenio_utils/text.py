@@ -21,27 +21,86 @@
 
 from __future__ import print_function
 
+import bisect
+import codecs
+import functools
+import hashlib
+import marshal
+import multiprocessing
+import os
 import re
+import sre_compile
+import sre_parse
 import sys
 import textwrap
+import time
 
 import pkg_resources
 import six
 from six.moves import html_entities
 from unidecode import unidecode
 
+from invenio_utils.memoise import LRUCache, memoize
+
 __revision__ = "$Id$"
 
 
 try:
-    import chardet
+    from chardet.universaldetector import UniversalDetector
     CHARDET_AVAILABLE = True
 except ImportError:
     CHARDET_AVAILABLE = False
 
+try:
+    import numpy
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+CFG_CHARDET_SAMPLE_SIZE = 1 << 14
+"""Maximum number of bytes fed to chardet to detect an encoding."""
+
+CFG_CHARDET_CHUNK_SIZE = 4096
+
+CFG_CHARDET_CONTEXT_SIZE = 1024
+"""ASCII bytes kept before the first non-ASCII byte of a skipped prefix.
+
+At most half of the chardet sample is used for this context.
+"""
+
+CFG_CHARDET_MIN_CONFIDENCE = 0.8
+
+_SOURCE_ENCODINGS = LRUCache(maxsize=1024)
+"""Encodings detected by :func:`decode_to_unicode` per source."""
+
+_RE_NON_ASCII_BYTE = re.compile(r'[\x80-\xff]')
+
 
 CFG_LATEX_UNICODE_TRANSLATION_CONST = {}
 
+CFG_LATEX_UNICODE_CACHE_DIR = None
+"""Directory of the precompiled LaTeX KB tables, or None to disable them.
+
+The precompiled tables skip most of the cold start of
+:func:`translate_latex2unicode`.  They are named after the KB path and
+the Python version, so several interpreters can share the directory.
+"""
+
+CFG_LATEX_UNICODE_RELOAD_INTERVAL = 60
+"""Seconds between two checks of the modification time of a loaded KB."""
+
+_LATEX_UNICODE_COMPILED_KEY = (1, sys.version, sre_compile.MAGIC)
+
+_LATEX_UNICODE_TABLES = {}
+"""Loaded KB tables keyed by ``kb_file``.
+
+Values are ``(path, mtime, constants, checked)`` where ``checked`` is the
+time of the last modification time check.
+"""
+
+CFG_TRANSLITERATION_CACHE_SIZE = 8192
+"""Number of recently transliterated strings kept per process."""
+
 CFG_WRAP_TEXT_IN_A_BOX_STYLES = {
     '__DEFAULT': {
         'horiz_sep': '*',
@@ -54,6 +113,7 @@ CFG_WRAP_TEXT_IN_A_BOX_STYLES = {
         'suffix': '\n',
         'break_long': False,
         'force_horiz': False,
+        'fixed_width': False,
     },
     'squared': {
         'horiz_sep': '-',
@@ -98,6 +158,8 @@ CFG_WRAP_TEXT_IN_A_BOX_STYLES = {
 
 }
 
+# Kept for backward compatibility, strip_accents() uses the expression and
+# the table below.
 re_unicode_lowercase_a = re.compile(unicode(r"(?u)[áàäâãå]", "utf-8"))
 re_unicode_lowercase_ae = re.compile(unicode(r"(?u)[æ]", "utf-8"))
 re_unicode_lowercase_oe = re.compile(unicode(r"(?u)[œ]", "utf-8"))
@@ -140,6 +202,30 @@ re_latex_uppercase_y = re.compile("\\\\[\"']\\{?Y\\}?")
 re_latex_uppercase_c = re.compile("\\\\['uc]\\{?C\\}?")
 re_latex_uppercase_n = re.compile("\\\\[c'~^vu]\\{?N\\}?")
 
+# Single pass equivalent of the re_latex_<letter> expressions; the accented
+# letter is the last matched group.
+re_latex_accents = re.compile(
+    r"""\\(?:["H'`~^vu=k]\{?([aeiouAEIOU])\}?"""
+    r"""|["']\{?([yY])\}?"""
+    r"""|['uc]\{?([cC])\}?"""
+    r"""|[c'~^vu]\{?([nN])\}?"""
+    r"""|(ae|oe)\{\}?"""
+    r"""|(AE|OE)\{?\}?)""")
+
+# LaTeX accented y has always been stripped to x.
+_LATEX_ACCENTS_REPLACEMENTS = {'y': 'x'}
+
+_LATIN1_ACCENTS_TABLE = dict(
+    (ord(char), replacement)
+    for chars, replacement in (
+        (u"áàäâãå", u"a"), (u"æ", u"ae"), (u"œ", u"oe"), (u"éèëê", u"e"),
+        (u"íìïî", u"i"), (u"óòöôõø", u"o"), (u"úùüû", u"u"), (u"ýÿ", u"y"),
+        (u"çć", u"c"), (u"ñ", u"n"), (u"ß", u"ss"),
+        (u"ÁÀÄÂÃÅ", u"A"), (u"Æ", u"AE"), (u"Œ", u"OE"), (u"ÉÈËÊ", u"E"),
+        (u"ÍÌÏÎ", u"I"), (u"ÓÒÖÔÕØ", u"O"), (u"ÚÙÜÛ", u"U"), (u"Ý", u"Y"),
+        (u"ÇĆ", u"C"), (u"Ñ", u"N"))
+    for char in chars)
+
 
 def get_kb_filename(filename='latex-to-unicode.kb'):
     """Get kb filename."""
@@ -164,19 +250,40 @@ def indent_text(text,
     :return: indented text as string
     """
     if not wrap:
-        lines = text.split(linebreak_input)
         tabs = nb_tabs * tab_str
-        output = ""
-        for line in lines:
-            output += tabs + line + linebreak_output
-        return output
+        return tabs + (linebreak_output + tabs).join(
+            text.split(linebreak_input)) + linebreak_output
     else:
         return wrap_text_in_a_box(body=text, style='no_border',
                                   tab_str=tab_str, tab_num=nb_tabs)
 
+
+def iter_indented_text(text, nb_tabs=0, tab_str="  ", linebreak_input="\n",
+                       wrap=False):
+    """Yield the lines of :func:`indent_text` without line breaks.
+
+    :param wrap: whether to yield the rows of a borderless text box
+    """
+    if not wrap:
+        tabs = nb_tabs * tab_str
+        for line in text.split(linebreak_input):
+            yield tabs + line
+    else:
+        for row in iter_text_in_a_box(body=text, style='no_border',
+                                      tab_str=tab_str, tab_num=nb_tabs):
+            yield row
+
 _RE_BEGINNING_SPACES = re.compile(r'^\s*')
 _RE_NEWLINES_CLEANER = re.compile(r'\n+')
 _RE_LONELY_NEWLINES = re.compile(r'\b\n\b')
+# Rows without other whitespace only break on runs of spaces, unless
+# they contain the hyphenated words or em-dashes of textwrap.wordsep_re,
+# whose matches always contain one of these.
+_RE_WRAP_WHITESPACE = re.compile(r'[^\S ]', re.U)
+_RE_WRAP_HYPHENS = re.compile(r'[^0-9\W]-\w|--\w', re.U)
+_RE_WRAP_SPACES = re.compile(' *')
+
+_WRAP_TEXT_IN_A_BOX_RESOLVED_STYLES = {}
 
 
 def wrap_text_in_a_box(body='', title='', style='double_star', **args):
@@ -216,6 +323,10 @@ def wrap_text_in_a_box(body='', title='', style='double_star', **args):
             max_col
         :param force_horiz: True in order to print the horizontal line even when
             there is no title
+        :param fixed_width: True in order to make the box max_col columns
+            wide instead of fitting it to its longest row; the body rows are
+            then rendered as soon as they are wrapped instead of being kept
+            in memory until the width is known
 
     e.g.:
     print wrap_text_in_a_box(title='prova',
@@ -229,65 +340,82 @@ def wrap_text_in_a_box(body='', title='', style='double_star', **args):
             si indenta
 
     """
-    def _wrap_row(row, max_col, break_long):
-        """Wrap a single row."""
-        spaces = _RE_BEGINNING_SPACES.match(row).group()
-        row = row[len(spaces):]
-        spaces = spaces.expandtabs()
-        return textwrap.wrap(row, initial_indent=spaces,
-                             subsequent_indent=spaces, width=max_col,
-                             break_long_words=break_long)
+    astyle = _get_wrap_text_in_a_box_style(style, args)
+    rows = _iter_text_in_a_box_rows(body, title, astyle)
+    return (astyle['prefix'] + '\n'.join(rows) +
+            astyle['suffix']).encode('utf-8')
+
+
+def iter_text_in_a_box(body='', title='', style='double_star', **args):
+    """Yield the UTF-8 encoded rows of :func:`wrap_text_in_a_box`.
+
+    The rows come without line breaks, prefix and suffix, so that large
+    bodies are never joined in memory.  Unless ``fixed_width=True`` is
+    given, the wrapped body rows are kept in memory until the width of the
+    box is known.
+    """
+    astyle = _get_wrap_text_in_a_box_style(style, args)
+    for row in _iter_text_in_a_box_rows(body, title, astyle):
+        yield row.encode('utf-8')
 
-    def _clean_newlines(text):
-        text = _RE_LONELY_NEWLINES.sub(' \n', text)
-        return _RE_NEWLINES_CLEANER.sub(lambda x: x.group()[:-1], text)
 
+def write_text_in_a_box(output_file, body='', title='', style='double_star',
+                        **args):
+    """Write the output of :func:`wrap_text_in_a_box` to a file row by row.
+
+    See :func:`iter_text_in_a_box` for the memory used by the rows.
+
+    :param output_file: file-like object accepting UTF-8 encoded strings
+    """
+    astyle = _get_wrap_text_in_a_box_style(style, args)
+    output_file.write(unicode(astyle['prefix']).encode('utf-8'))
+    separator = ''
+    for row in _iter_text_in_a_box_rows(body, title, astyle):
+        output_file.write(separator + row.encode('utf-8'))
+        separator = '\n'
+    output_file.write(unicode(astyle['suffix']).encode('utf-8'))
+
+
+def _get_wrap_text_in_a_box_style(style, args):
+    """Return the style merged with the defaults and the overrides.
+
+    Styles of CFG_WRAP_TEXT_IN_A_BOX_STYLES are resolved once per process.
+    """
+    try:
+        astyle = _WRAP_TEXT_IN_A_BOX_RESOLVED_STYLES[style]
+    except KeyError:
+        astyle = dict(CFG_WRAP_TEXT_IN_A_BOX_STYLES['__DEFAULT'])
+        if style in CFG_WRAP_TEXT_IN_A_BOX_STYLES:
+            astyle.update(CFG_WRAP_TEXT_IN_A_BOX_STYLES[style])
+            _WRAP_TEXT_IN_A_BOX_RESOLVED_STYLES[style] = astyle
+    if args:
+        astyle = dict(astyle, **args)
+    return astyle
+
+
+def _iter_text_in_a_box_rows(body, title, astyle):
+    """Yield the Unicode rows of a text box."""
     body = unicode(body, 'utf-8')
     title = unicode(title, 'utf-8')
 
-    astyle = dict(CFG_WRAP_TEXT_IN_A_BOX_STYLES['__DEFAULT'])
-    if style in CFG_WRAP_TEXT_IN_A_BOX_STYLES:
-        astyle.update(CFG_WRAP_TEXT_IN_A_BOX_STYLES[style])
-    astyle.update(args)
-
     horiz_sep = astyle['horiz_sep']
     border = astyle['border']
     tab_str = astyle['tab_str'] * astyle['tab_num']
     max_col = max(astyle['max_col'] -
                   len(border[3]) - len(border[4]) - len(tab_str), 1)
     min_col = astyle['min_col']
-    prefix = astyle['prefix']
-    suffix = astyle['suffix']
     force_horiz = astyle['force_horiz']
     break_long = astyle['break_long']
 
-    body = _clean_newlines(body)
-    tmp_rows = [_wrap_row(row, max_col, break_long)
-                for row in body.split('\n')]
-    body_rows = []
-    for rows in tmp_rows:
-        if rows:
-            body_rows += rows
-        else:
-            body_rows.append('')
-    if not ''.join(body_rows).strip():
-        # Concrete empty body
-        body_rows = []
-
-    title = _clean_newlines(title)
-    tmp_rows = [_wrap_row(row, max_col, break_long)
-                for row in title.split('\n')]
-    title_rows = []
-    for rows in tmp_rows:
-        if rows:
-            title_rows += rows
-        else:
-            title_rows.append('')
-    if not ''.join(title_rows).strip():
-        # Concrete empty title
-        title_rows = []
-
-    max_col = max([len(row) for row in body_rows + title_rows] + [min_col])
+    title_rows = list(_iter_wrapped_rows(title, max_col, break_long))
+    body_rows = _iter_wrapped_rows(body, max_col, break_long)
+    if astyle['fixed_width']:
+        # body words longer than max_col overflow the box unless break_long
+        widths = [max_col]
+    else:
+        body_rows = list(body_rows)
+        widths = [len(row) for row in body_rows]
+    max_col = max([min_col] + [len(row) for row in title_rows] + widths)
 
     mid_top_border_len = max_col + \
         len(border[3]) + len(border[4]) - len(border[0]) - len(border[2])
@@ -304,22 +432,124 @@ def wrap_text_in_a_box(body='', title='', style='double_star', **args):
     else:
         horiz_line = border[3] + (horiz_sep * max_col)[:max_col] + border[4]
 
-    title_rows = [tab_str + border[3] + row +
-                  ' ' * (max_col - len(row)) +
-                  border[4] for row in title_rows]
-    body_rows = [tab_str + border[3] + row +
-                 ' ' * (max_col - len(row)) + border[4] for row in body_rows]
-
-    ret = []
+    left = tab_str + border[3]
+    right = border[4]
     if top_border:
-        ret += [tab_str + top_border]
-    ret += title_rows
+        yield tab_str + top_border
+    for row in title_rows:
+        yield left + row + ' ' * (max_col - len(row)) + right
     if title_rows or force_horiz:
-        ret += [tab_str + horiz_line]
-    ret += body_rows
+        yield tab_str + horiz_line
+    for row in body_rows:
+        yield left + row + ' ' * (max_col - len(row)) + right
     if bottom_border:
-        ret += [tab_str + bottom_border]
-    return (prefix + '\n'.join(ret) + suffix).encode('utf-8')
+        yield tab_str + bottom_border
+
+
+def _iter_wrapped_rows(text, max_col, break_long):
+    """Yield the wrapped rows of a title or body, nothing if it is blank.
+
+    Only the leading blank rows are kept until a row with some text shows
+    that the text is not blank.
+    """
+    blank_rows = []
+    for line in _iter_reflowed_lines(text):
+        rows = _wrap_text_in_a_box_row(line, max_col, break_long) or [u'']
+        if blank_rows is None:
+            for row in rows:
+                yield row
+        elif any(row.strip() for row in rows):
+            for row in blank_rows + rows:
+                yield row
+            blank_rows = None
+        else:
+            blank_rows.extend(rows)
+
+
+def _iter_reflowed_lines(text):
+    """Yield the lines of text once newlines are cleaned up.
+
+    A lonely newline between two words becomes a space, any other single
+    newline is removed and runs of newlines lose one newline.
+    """
+    pieces = []
+    position = 0
+    for match in _RE_NEWLINES_CLEANER.finditer(text):
+        start, end = match.span()
+        pieces.append(text[position:start])
+        if end - start > 1:
+            yield u''.join(pieces)
+            pieces = []
+            for dummy in range(end - start - 2):
+                yield u''
+        elif _RE_LONELY_NEWLINES.match(text, start):
+            pieces.append(u' ')
+        position = end
+    pieces.append(text[position:])
+    yield u''.join(pieces)
+
+
+def _wrap_text_in_a_box_row(row, max_col, break_long):
+    """Wrap a single row."""
+    spaces = _RE_BEGINNING_SPACES.match(row).group()
+    row = row[len(spaces):]
+    spaces = spaces.expandtabs()
+    width = max_col - len(spaces)
+    if width < 1 or _RE_WRAP_WHITESPACE.search(row) or \
+            '-' in row and _RE_WRAP_HYPHENS.search(row):
+        return textwrap.wrap(row, initial_indent=spaces,
+                             subsequent_indent=spaces, width=max_col,
+                             break_long_words=break_long)
+    return _wrap_words(row, width, spaces, break_long)
+
+
+def _wrap_words(text, width, indent, break_long):
+    """Wrap words separated by spaces exactly as :func:`textwrap.wrap`.
+
+    Lines are cut with string searches instead of splitting the text into
+    chunks, which matters for the long paragraphs of task logs: a reused
+    ``TextWrapper(break_on_hyphens=False)`` is still more than ten times
+    slower on them.
+    """
+    lines = []
+    length = len(text)
+    start = 0
+    while start < length:
+        end = start + width
+        if end >= length:
+            line = text[start:].rstrip(' ')
+            next_start = length
+        elif text[end] == ' ':
+            line = text[start:end].rstrip(' ')
+            next_start = end
+        elif text[end - 1] == ' ':
+            word_end = text.find(' ', end)
+            if word_end == -1:
+                word_end = length
+            if break_long and word_end - end > width:
+                # textwrap keeps the trailing spaces before a broken word
+                line = text[start:end]
+            else:
+                line = text[start:end].rstrip(' ')
+            next_start = end
+        else:
+            word_start = max(text.rfind(' ', start, end) + 1, start)
+            word_end = text.find(' ', end)
+            if word_end == -1:
+                word_end = length
+            if break_long and (word_start == start or
+                               word_end - word_start > width):
+                line = text[start:end]
+                next_start = end
+            elif word_start == start:
+                line = text[start:word_end]
+                next_start = word_end
+            else:
+                line = text[start:word_start].rstrip(' ')
+                next_start = word_start
+        lines.append(indent + line)
+        start = _RE_WRAP_SPACES.match(text, next_start).end()
+    return lines
 
 
 def wait_for_user(msg=""):
@@ -365,20 +595,76 @@ def guess_minimum_encoding(text, charsets=('ascii', 'latin1', 'utf8')):
     return (text_in_unicode.encode('utf8'), 'utf8')
 
 
+XML_ESCAPES = (('&', '&amp;'), ('<', '&lt;'))
+XML_QUOTE_ESCAPES = XML_ESCAPES + (('"', '&quot;'), )
+
+_ESCAPE_DELETECHARS = {}
+
+
 def encode_for_xml(text, wash=False, xml_version='1.0', quote=False):
     """Encode special characters in a text so that it would be XML-compliant.
 
     :param text: text to encode
     :return: an encoded text
     """
+    if wash:
+        return escape_and_wash(
+            text, XML_QUOTE_ESCAPES if quote else XML_ESCAPES, xml_version)
     text = text.replace('&', '&amp;')
     text = text.replace('<', '&lt;')
     if quote:
         text = text.replace('"', '&quot;')
-    if wash:
-        text = wash_for_xml(text, xml_version=xml_version)
     return text
 
+
+def escape_and_wash(text, escapes, xml_version=None):
+    """Replace special characters and optionally wash the text for XML.
+
+    When washing, one ``str.translate`` pass deletes the bytes that need
+    neither escaping nor washing: clean text is returned as it is, only the
+    escapes of the characters actually present are applied and the text is
+    decoded only if it may contain characters to wash.
+
+    :param text: UTF-8 encoded string to escape
+    :param escapes: sequence of ``(char, replacement)`` pairs, applied in
+        order, so ``'&'`` must come first
+    :param xml_version: if given, remove the characters not allowed in this
+        version of XML, see :func:`wash_for_xml`
+    :return: escaped string
+    """
+    if xml_version is None or not isinstance(text, str):
+        # str.replace returns the string itself when there is nothing to do.
+        for char, replacement in escapes:
+            text = text.replace(char, replacement)
+        if xml_version is not None:
+            text = wash_for_xml(text, xml_version=xml_version)
+        return text
+    key = (escapes, xml_version)
+    try:
+        clean_bytes, special_bytes = _ESCAPE_DELETECHARS[key]
+    except KeyError:
+        special_bytes = ''.join(char for char, dummy in escapes)
+        clean_bytes = (_XML_1_0_ASCII_BYTES if xml_version == '1.0'
+                       else _XML_1_1_ASCII_BYTES).translate(None, special_bytes)
+        _ESCAPE_DELETECHARS[key] = (clean_bytes, special_bytes)
+    rest = text.translate(None, clean_bytes)
+    if not rest:
+        return text
+    for char, replacement in escapes:
+        if char in rest:
+            text = text.replace(char, replacement)
+    if rest.translate(None, special_bytes):
+        # Control or non-ASCII characters, see wash_for_xml().
+        forbidden = RE_FORBIDDEN_XML_1_0_BYTES if xml_version == '1.0' \
+            else RE_FORBIDDEN_XML_1_1_BYTES
+        if forbidden.search(rest) is None:
+            text.decode('utf-8')
+        else:
+            text = _wash_for_xml(
+                unicode(text, 'utf-8'), xml_version).encode('utf-8')
+    return text
+
+
 try:
     unichr(0x100000)
     RE_ALLOWED_XML_1_0_CHARS = re.compile(
@@ -386,6 +672,7 @@ try:
         u'\U0000D7FF\U0000E000-\U0000FFFD\U00010000-\U0010FFFF]')
     RE_ALLOWED_XML_1_1_CHARS = re.compile(
         u'[^\U00000001-\U0000D7FF\U0000E000-\U0000FFFD\U00010000-\U0010FFFF]')
+    _NARROW_BUILD_BYTES = ''
 except ValueError:
     # oops, we are running on a narrow UTF/UCS Python build,
     # so we have to limit the UTF/UCS char range:
@@ -394,6 +681,21 @@ except ValueError:
         u'\U0000D7FF\U0000E000-\U0000FFFD]')
     RE_ALLOWED_XML_1_1_CHARS = re.compile(
         u'[^\U00000001-\U0000D7FF\U0000E000-\U0000FFFD]')
+    # ... and characters above U+FFFF are washed away too.
+    _NARROW_BUILD_BYTES = '|[\xf0-\xf7]'
+
+# UTF-8 encoded forms of the characters removed by RE_ALLOWED_XML_*_CHARS:
+# control characters, surrogates (U+D800-U+DFFF) and U+FFFE, U+FFFF.
+RE_FORBIDDEN_XML_1_0_BYTES = re.compile(
+    '[\x00-\x08\x0b\x0c\x0e-\x1f]|\xed[\xa0-\xbf]|\xef\xbf[\xbe\xbf]' +
+    _NARROW_BUILD_BYTES)
+RE_FORBIDDEN_XML_1_1_BYTES = re.compile(
+    '\x00|\xed[\xa0-\xbf]|\xef\xbf[\xbe\xbf]' + _NARROW_BUILD_BYTES)
+
+_XML_1_0_ASCII_BYTES = '\t\n\r' + ''.join(chr(i) for i in range(0x20, 0x80))
+_XML_1_1_ASCII_BYTES = ''.join(chr(i) for i in range(0x01, 0x80))
+
+CFG_WASH_FOR_XML_CHUNK_SIZE = 1 << 16
 
 
 def wash_for_xml(text, xml_version='1.0'):
@@ -411,12 +713,55 @@ def wash_for_xml(text, xml_version='1.0'):
     :param xml_version: version of the XML for which we wash the
         input. Value for this parameter can be '1.0' or '1.1'
     """
+    if isinstance(text, str):
+        if xml_version == '1.0':
+            ascii_allowed, forbidden = _XML_1_0_ASCII_BYTES, \
+                RE_FORBIDDEN_XML_1_0_BYTES
+        else:
+            ascii_allowed, forbidden = _XML_1_1_ASCII_BYTES, \
+                RE_FORBIDDEN_XML_1_1_BYTES
+        # Only the control and non-ASCII bytes can need washing.
+        rest = text.translate(None, ascii_allowed)
+        if not rest:
+            return text
+        if forbidden.search(rest) is None:
+            # Nothing to wash: only check that the input is valid UTF-8.
+            text.decode('utf-8')
+            return text
+    return _wash_for_xml(unicode(text, 'utf-8'), xml_version).encode('utf-8')
+
+
+def wash_for_xml_stream(input_file, output_file, xml_version='1.0',
+                        chunk_size=CFG_WASH_FOR_XML_CHUNK_SIZE):
+    """Copy a UTF-8 file removing characters not allowed in XML.
+
+    The file is processed chunk by chunk, so that large exports are washed
+    with bounded memory.  See :func:`wash_for_xml`.
+
+    :param input_file: file-like object to read from
+    :param output_file: file-like object to write to
+    :param xml_version: version of the XML for which we wash the
+        input. Value for this parameter can be '1.0' or '1.1'
+    :param chunk_size: number of bytes read at once
+    """
+    # The incremental decoder keeps characters split between two chunks.
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        chunk = input_file.read(chunk_size)
+        text = decoder.decode(chunk, final=not chunk)
+        if text:
+            output_file.write(
+                _wash_for_xml(text, xml_version).encode('utf-8'))
+        if not chunk:
+            break
+
+
+def _wash_for_xml(text, xml_version='1.0'):
+    """Unicode version of :func:`wash_for_xml`."""
     if xml_version == '1.0':
-        return RE_ALLOWED_XML_1_0_CHARS.sub(
-            '', unicode(text, 'utf-8')).encode('utf-8')
+        return RE_ALLOWED_XML_1_0_CHARS.sub(u'', text)
     else:
-        return RE_ALLOWED_XML_1_1_CHARS.sub(
-            '', unicode(text, 'utf-8')).encode('utf-8')
+        return RE_ALLOWED_XML_1_1_CHARS.sub(u'', text)
 
 
 def wash_for_utf8(text, correct=True):
@@ -448,18 +793,55 @@ def nice_number(number, thousands_separator=',', max_ndigits_after_dot=None):
         if max_ndigits_after_dot is not None:
             number = round(number, max_ndigits_after_dot)
         int_part, frac_part = str(number).split('.')
-        return '%s.%s' % (nice_number(int(int_part), thousands_separator),
-                          frac_part)
+        if int_part.isdigit():
+            int_part = format(int(int_part), ',')
+            if thousands_separator != ',':
+                int_part = int_part.replace(',', thousands_separator)
+        else:
+            int_part = nice_number(int(int_part), thousands_separator)
+        return '%s.%s' % (int_part, frac_part)
+    elif type(number) in six.integer_types and number >= 0:
+        digits = format(number, ',')
+        if thousands_separator != ',':
+            digits = digits.replace(',', thousands_separator)
+        return digits
     else:
-        chars_in = list(str(number))
-        number = len(chars_in)
-        chars_out = []
-        for i in range(0, number):
-            if i % 3 == 0 and i != 0:
-                chars_out.append(thousands_separator)
-            chars_out.append(chars_in[number - i - 1])
-        chars_out.reverse()
-        return ''.join(chars_out)
+        # group the characters of the representation, the sign included
+        chars = str(number)
+        head = len(chars) % 3 or 3
+        return thousands_separator.join(
+            [chars[:head]] +
+            [chars[i:i + 3] for i in range(head, len(chars), 3)])
+
+
+def nice_numbers(numbers, thousands_separator=',',
+                 max_ndigits_after_dot=None):
+    """Return the list of nicely printed numbers.
+
+    The output is identical to calling :func:`nice_number` on each number.
+    NumPy arrays are flattened and their items formatted as the
+    equivalent Python numbers.
+
+    :param numbers: iterable of numbers or NumPy array
+    """
+    if NUMPY_AVAILABLE and isinstance(numbers, numpy.ndarray):
+        numbers = numbers.ravel().tolist()
+    integer_types = six.integer_types
+    result = []
+    append = result.append
+    for number in numbers:
+        if type(number) in integer_types and number >= 0:
+            digits = format(number, ',')
+            if thousands_separator != ',':
+                digits = digits.replace(',', thousands_separator)
+            append(digits)
+        else:
+            append(nice_number(number, thousands_separator,
+                               max_ndigits_after_dot))
+    return result
+
+
+_NICE_SIZE_UNITS = ('B', 'KB', 'MB', 'GB')
 
 
 def nice_size(size):
@@ -483,28 +865,86 @@ def nice_size(size):
     return '%s %s' % (nice_number(size, max_ndigits_after_dot=2), unit)
 
 
+def nice_sizes(sizes):
+    """Return the list of nicely printed sizes.
+
+    The output is identical to calling :func:`nice_size` on each size.
+    The units of NumPy arrays are chosen with vectorized operations.
+
+    :param sizes: iterable of sizes or NumPy array
+    """
+    if NUMPY_AVAILABLE and isinstance(sizes, numpy.ndarray):
+        sizes = sizes.ravel()
+        scaled = sizes.astype(float)
+        exponents = numpy.zeros(sizes.shape, dtype=int)
+        for dummy in range(len(_NICE_SIZE_UNITS) - 1):
+            larger = scaled > 1024
+            scaled[larger] /= 1024.0
+            exponents += larger
+        return ['%s %s' % (nice_number(value if exponent else size, ',', 2),
+                           _NICE_SIZE_UNITS[exponent])
+                for size, value, exponent in zip(sizes.tolist(),
+                                                 scaled.tolist(),
+                                                 exponents.tolist())]
+    result = []
+    append = result.append
+    for size in sizes:
+        exponent = 0
+        while size > 1024 and exponent < len(_NICE_SIZE_UNITS) - 1:
+            size /= 1024.0
+            exponent += 1
+        append('%s %s' % (nice_number(size, ',', 2), _NICE_SIZE_UNITS[exponent]))
+    return result
+
+
+_LINE_BREAK_CHARS = '\f\n\r'
+_LINE_BREAK_SEQUENCES = (u'\xe2\x80\xa8', u'\xe2\x80\xa9', u'\xc2\x85')
+_LINE_BREAK_SEQUENCES_UTF8 = tuple(sequence.encode('utf-8')
+                                   for sequence in _LINE_BREAK_SEQUENCES)
+
+
 def remove_line_breaks(text):
     """Remove line breaks from input.
 
     Including unicode 'line separator', 'paragraph separator',
     and 'next line' characters.
     """
-    return unicode(text, 'utf-8').replace('\f', '').replace('\n', '') \
-        .replace('\r', '').replace(u'\xe2\x80\xa8', '') \
-        .replace(u'\xe2\x80\xa9', '').replace(u'\xc2\x85', '') \
-        .encode('utf-8')
+    # the text is only decoded to be validated: UTF-8 sequences never
+    # contain ASCII bytes, so the line breaks can be removed in place
+    unicode(text, 'utf-8')
+    text = text.translate(None, _LINE_BREAK_CHARS)
+    if '\xc2' in text:
+        for sequence in _LINE_BREAK_SEQUENCES_UTF8:
+            text = text.replace(sequence, '')
+    return text
+
 
+def remove_line_breaks_many(values):
+    """Remove line breaks in every string of the input sequence.
+
+    :param values: iterable of UTF-8 encoded strings
+    :return: list of strings, see :func:`remove_line_breaks`
+    """
+    return [remove_line_breaks(value) for value in values]
 
-def decode_to_unicode(text, default_encoding='utf-8'):
+
+def _remove_line_breaks(text):
+    """Unicode version of :func:`remove_line_breaks`."""
+    text = text.replace('\f', '').replace('\n', '').replace('\r', '')
+    for sequence in _LINE_BREAK_SEQUENCES:
+        text = text.replace(sequence, '')
+    return text
+
+
+def decode_to_unicode(text, default_encoding='utf-8', source=None):
     """Decode input text into Unicode representation.
 
     Decode input text into Unicode representation by first using the default
     encoding utf-8.
     If the operation fails, it detects the type of encoding used in the
-    given text.
+    given text, see :func:`detect_encoding`.
     For optimal result, it is recommended that the 'chardet' module is
     installed.
-    NOTE: Beware that this might be slow for *very* large strings.
 
     If chardet detection fails, it will try to decode the string using the basic
     detection function guess_minimum_encoding().
@@ -520,6 +960,10 @@ def decode_to_unicode(text, default_encoding='utf-8'):
     :param default_encoding: the character encoding to use. Optional.
     :type default_encoding: string
 
+    :param source: hashable identifier of the origin of the text, such as
+        the URL of a harvested feed.  The encoding detected for a source is
+        tried first for its next texts.  Optional.
+
     :return: input text as Unicode
     :rtype: string
     """
@@ -529,16 +973,66 @@ def decode_to_unicode(text, default_encoding='utf-8'):
         return text.decode(default_encoding)
     except (UnicodeError, LookupError):
         pass
-    detected_encoding = None
-    if CHARDET_AVAILABLE:
-        # We can use chardet to perform detection
-        res = chardet.detect(text)
-        if res['confidence'] >= 0.8:
-            detected_encoding = res['encoding']
-    if detected_encoding is None:
-        # No chardet detection, try to make a basic guess
+    if source is not None:
+        source_encoding = _SOURCE_ENCODINGS.get(source)
+        if source_encoding is not None:
+            try:
+                return text.decode(source_encoding)
+            except (UnicodeError, LookupError):
+                pass
+    detected_encoding = detect_encoding(text)
+    try:
+        unicode_text = text.decode(detected_encoding)
+    except (UnicodeError, LookupError):
+        # The sample was not representative of the whole text.
         dummy, detected_encoding = guess_minimum_encoding(text)
-    return text.decode(detected_encoding)
+        unicode_text = text.decode(detected_encoding)
+    if source is not None:
+        _SOURCE_ENCODINGS[source] = detected_encoding
+    return unicode_text
+
+
+def detect_encoding(text, sample_size=CFG_CHARDET_SAMPLE_SIZE):
+    """Detect the encoding of a byte string.
+
+    Chardet is fed with chunks of the text until it is confident or
+    ``sample_size`` bytes have been read, so that very large strings are not
+    scanned entirely.  When the first non-ASCII byte lies beyond
+    ``sample_size``, the ASCII prefix is skipped except for its last
+    CFG_CHARDET_CONTEXT_SIZE bytes (at most half of the sample), which
+    chardet also weighs.
+    Without chardet, or when it is not confident enough, the encoding is
+    guessed with guess_minimum_encoding().
+
+    :param text: the text to analyse
+    :type text: string
+
+    :param sample_size: maximum number of bytes given to chardet
+    :type sample_size: int
+
+    :return: name of the encoding
+    :rtype: string
+    """
+    if CHARDET_AVAILABLE:
+        match = _RE_NON_ASCII_BYTE.search(text)
+        start = 0
+        if match and match.start() >= sample_size:
+            start = match.start() - min(CFG_CHARDET_CONTEXT_SIZE,
+                                        sample_size // 2)
+        stop = min(len(text), start + sample_size)
+        detector = UniversalDetector()
+        for offset in range(start, stop, CFG_CHARDET_CHUNK_SIZE):
+            detector.feed(text[offset:min(
+                offset + CFG_CHARDET_CHUNK_SIZE, stop)])
+            if detector.done:
+                break
+        detector.close()
+        if detector.result['encoding'] is not None and \
+                detector.result['confidence'] >= CFG_CHARDET_MIN_CONFIDENCE:
+            return detector.result['encoding']
+    # No chardet detection, try to make a basic guess
+    dummy, detected_encoding = guess_minimum_encoding(text)
+    return detected_encoding
 
 
 def to_unicode(text):
@@ -559,8 +1053,10 @@ def translate_latex2unicode(text, kb_file=None):
     CFG_ETCDIR/bibconvert/KB/latex-to-unicode.kb.
     The translated Unicode string will then be returned.
 
-    If the translation table and compiled regular expression object is not
-    previously generated in the current session, they will be.
+    The translation table and compiled regular expression object are
+    cached per KB file and reloaded when the file modification time
+    changes, which is checked every CFG_LATEX_UNICODE_RELOAD_INTERVAL
+    seconds.
 
     :param text: a text presumably containing LaTeX symbols.
     :type text: string
@@ -572,66 +1068,228 @@ def translate_latex2unicode(text, kb_file=None):
     :return: Unicode representation of translated text
     :rtype: unicode
     """
-    if kb_file is None:
-        kb_file = get_kb_filename()
     # First decode input text to Unicode
     try:
         text = decode_to_unicode(text)
     except UnicodeDecodeError:
         text = unicode(wash_for_utf8(text))
+    return _latex2unicode(text, kb_file)
+
+
+def _latex2unicode(text, kb_file=None):
+    """Unicode version of :func:`translate_latex2unicode`."""
     # Load translation table, if required
-    if CFG_LATEX_UNICODE_TRANSLATION_CONST == {}:
-        _load_latex2unicode_constants(kb_file)
-    # Find all matches and replace text
-    for match in CFG_LATEX_UNICODE_TRANSLATION_CONST['regexp_obj'] \
-            .finditer(text):
-        # If LaTeX style markers {, } and $ are before or after the
-        # matching text, it will replace those as well
-        text = re.sub("[\{\$]?%s[\}\$]?" % (re.escape(match.group()),),
-                      CFG_LATEX_UNICODE_TRANSLATION_CONST[
-                          'table'][match.group()],
-                      text)
-    # Return Unicode representation of translated text
-    return text
+    constants = _load_latex2unicode_constants(kb_file)
+    if not constants:
+        return text
+    table = constants['table']
+    # Replace all symbols in one pass. If LaTeX style markers {, } and $
+    # are before or after the matching text, they are replaced as well.
+    return constants['regexp_obj'].sub(
+        lambda match: table[match.group(match.lastindex)], text)
+
+
+def _trie_to_regexp(trie):
+    """Return a regular expression matching the longest word of a trie.
+
+    The pattern branches on one character at a time, so ``re`` rejects a
+    position after looking at its first character instead of trying every
+    word of the alternation.
+
+    :param trie: nested dict of characters, ``''`` marking the end of a word
+    :return: regular expression string
+    """
+    alternatives = [re.escape(char) + _trie_to_regexp(child)
+                    for char, child in sorted(trie.items()) if char]
+    if not alternatives:
+        return ''
+    pattern = '|'.join(alternatives)
+    if len(alternatives) > 1 or '' in trie:
+        pattern = '(?:%s)' % (pattern, )
+    if '' in trie:
+        pattern += '?'
+    return pattern
 
 
 def _load_latex2unicode_constants(kb_file=None):
     """Load LaTeX2Unicode translation table dictionary.
 
     Load LaTeX2Unicode translation table dictionary and regular
-    expression object from KB to a global dictionary.
+    expression object of the KB, unless they are already cached and the KB
+    file has not been modified since.  The modification time is checked at
+    most every CFG_LATEX_UNICODE_RELOAD_INTERVAL seconds, and the
+    precompiled tables in CFG_LATEX_UNICODE_CACHE_DIR are only read when
+    the KB is (re)loaded.  The tables of the default KB are also kept in
+    CFG_LATEX_UNICODE_TRANSLATION_CONST.
 
     :param kb_file: full path to file containing latex2unicode translations.
                     Defaults to CFG_ETCDIR/bibconvert/KB/latex-to-unicode.kb
     :type kb_file: string
 
-    :return: dict of type: {'regexp_obj': regexp match object,
-                            'table': dict of LaTeX -> Unicode mappings}
+    :return: dict of type: {'regexp_obj': regexp matching any LaTeX symbol
+                                          (last group) with optional {, } and
+                                          $ markers around it,
+                            'table': dict of LaTeX -> Unicode mappings},
+             or empty dict if the KB file cannot be read
     :rtype: dict
     """
-    if kb_file is None:
-        kb_file = get_kb_filename()
-
+    cached = _LATEX_UNICODE_TABLES.get(kb_file)
+    now = time.time()
+    if cached is not None:
+        path, dummy, constants, checked = cached
+        if 0 <= now - checked < CFG_LATEX_UNICODE_RELOAD_INTERVAL:
+            return constants
+    elif kb_file is None:
+        path = get_kb_filename()
+    else:
+        path = kb_file
     try:
-        data = open(kb_file)
-    except IOError:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+    if cached is not None and cached[1] == mtime:
+        _LATEX_UNICODE_TABLES[kb_file] = (path, mtime, constants, now)
+        return constants
+
+    compiled_file = _latex2unicode_compiled_file(path)
+    constants = (mtime is not None and compiled_file is not None and
+                 _read_compiled_latex2unicode(compiled_file, mtime)) or \
+        _compile_latex2unicode(path, mtime, compiled_file)
+    if not constants:
         # File not found or similar
         sys.stderr.write(
             "\nCould not open LaTeX to Unicode KB file. "
             "Aborting translation.\n")
-        return CFG_LATEX_UNICODE_TRANSLATION_CONST
-    latex_symbols = []
+        _LATEX_UNICODE_TABLES.pop(kb_file, None)
+        return constants
+    _LATEX_UNICODE_TABLES[kb_file] = (path, mtime, constants, now)
+    if kb_file is None:
+        CFG_LATEX_UNICODE_TRANSLATION_CONST.clear()
+        CFG_LATEX_UNICODE_TRANSLATION_CONST.update(constants)
+    return constants
+
+
+def _latex2unicode_compiled_file(kb_file):
+    """Return the path of the precompiled KB in the cache directory.
+
+    :param kb_file: full path to file containing latex2unicode translations
+    :return: path of the precompiled KB, or None if there is no cache
+        directory
+    """
+    if not CFG_LATEX_UNICODE_CACHE_DIR:
+        return None
+    key = repr((os.path.abspath(kb_file), _LATEX_UNICODE_COMPILED_KEY))
+    return os.path.join(CFG_LATEX_UNICODE_CACHE_DIR,
+                        hashlib.sha1(key).hexdigest() + '.kbc')
+
+
+def _compile_latex2unicode(kb_file, mtime, compiled_file=None):
+    """Parse the KB file and write its precompiled form to the cache.
+
+    :param kb_file: full path to file containing latex2unicode translations
+    :param mtime: modification time of ``kb_file``
+    :param compiled_file: path of the precompiled KB to write, if any
+    :return: dict with 'regexp_obj' and 'table', empty if the KB file
+        cannot be read
+    """
+    try:
+        data = open(kb_file)
+    except IOError:
+        return {}
+    symbols_trie = {}
     translation_table = {}
     for line in data:
         # The file has form of latex|--|utf-8. First decode to Unicode.
         line = line.decode('utf-8')
         mapping = line.split('|--|')
-        translation_table[mapping[0].rstrip('\n')] = mapping[1].rstrip('\n')
-        latex_symbols.append(re.escape(mapping[0].rstrip('\n')))
+        symbol = mapping[0].rstrip('\n')
+        translation_table[symbol] = mapping[1].rstrip('\n')
+        node = symbols_trie
+        for char in symbol:
+            node = node.setdefault(char, {})
+        node[''] = {}
     data.close()
-    CFG_LATEX_UNICODE_TRANSLATION_CONST[
-        'regexp_obj'] = re.compile("|".join(latex_symbols))
-    CFG_LATEX_UNICODE_TRANSLATION_CONST['table'] = translation_table
+    # Symbols starting with a marker, such as {\AA}, take precedence over
+    # the marker followed by a shorter symbol.  The leading lookahead lets
+    # ``re`` skip quickly over text that cannot start a match.
+    symbols = _trie_to_regexp(symbols_trie)
+    pattern = "(?=[%s])(?:(%s)|[\{\$](%s))[\}\$]?" % (
+        re.escape(''.join(sorted(set(symbols_trie) | set('{$')))),
+        symbols, symbols)
+    if compiled_file is None or mtime is None:
+        return {'regexp_obj': re.compile(pattern),
+                'table': translation_table}
+    program = _sre_program(pattern)
+
+    # The precompiled form is only an optimisation: the cache directory
+    # may well be read-only.
+    if program is not None:
+        tmp_file = '%s.%d.tmp' % (compiled_file, os.getpid())
+        try:
+            if not os.path.isdir(os.path.dirname(compiled_file)):
+                os.makedirs(os.path.dirname(compiled_file))
+            with open(tmp_file, 'wb') as stream:
+                marshal.dump((_LATEX_UNICODE_COMPILED_KEY, mtime,
+                              translation_table, pattern, program), stream)
+            os.rename(tmp_file, compiled_file)
+        except (IOError, OSError):
+            pass
+
+    return {'regexp_obj': _sre_compile(pattern, program),
+            'table': translation_table}
+
+
+def _read_compiled_latex2unicode(compiled_file, mtime):
+    """Return the tables stored in the precompiled form of the KB.
+
+    :param compiled_file: path of the precompiled KB
+    :param mtime: modification time of the KB file
+    :return: dict with 'regexp_obj' and 'table', or None if the precompiled
+        file is missing, corrupted, or out of date
+    """
+    try:
+        with open(compiled_file, 'rb') as stream:
+            key, compiled_mtime, translation_table, pattern, program = \
+                marshal.load(stream)
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+    if key != _LATEX_UNICODE_COMPILED_KEY or compiled_mtime != mtime:
+        return None
+    return {'regexp_obj': _sre_compile(pattern, program),
+            'table': translation_table}
+
+
+def _sre_program(pattern):
+    """Return the arguments of ``_sre.compile`` for the pattern.
+
+    Compiling the KB regular expression takes far longer than running the
+    resulting program, so the program is stored in the precompiled KB.  The
+    program is specific to the interpreter, hence the precompiled KB is
+    keyed by Python version and ``sre_compile.MAGIC``.
+
+    :return: tuple of arguments, or None when not supported
+    """
+    if sys.version_info[0] != 2 or \
+            not hasattr(sre_compile, '_code') or \
+            not hasattr(getattr(sre_compile, '_sre', None), 'compile'):
+        return None
+    parsed = sre_parse.parse(pattern, 0)
+    groupindex = parsed.pattern.groupdict
+    indexgroup = [None] * parsed.pattern.groups
+    for name, index in groupindex.items():
+        indexgroup[index] = name
+    return (parsed.pattern.flags, sre_compile._code(parsed, 0),
+            parsed.pattern.groups - 1, groupindex, indexgroup)
+
+
+def _sre_compile(pattern, program=None):
+    """Return the regular expression object of a precompiled program."""
+    if program is not None:
+        try:
+            return sre_compile._sre.compile(pattern, *program)
+        except (AttributeError, TypeError, ValueError, RuntimeError):
+            pass
+    return re.compile(pattern)
 
 
 def translate_to_ascii(values):
@@ -661,22 +1319,75 @@ def translate_to_ascii(values):
     for index, value in enumerate(values):
         if not value:
             continue
-        unicode_text = decode_to_unicode(value)
-        if u"[?]" in unicode_text:
-            decoded_text = []
-            for unicode_char in unicode_text:
-                decoded_char = unidecode(unicode_char)
-                # Skip unrecognized characters
-                if decoded_char != "[?]":
-                    decoded_text.append(decoded_char)
-            ascii_text = ''.join(decoded_text).encode('ascii')
-        else:
-            ascii_text = unidecode(unicode_text).replace(
-                u"[?]", u"").encode('ascii')
-        values[index] = ascii_text
+        values[index] = _translate_value_to_ascii(value)
     return values
 
 
+def translate_to_ascii_many(values, workers=1, chunksize=256, pool=None):
+    """Transliterate every string of an iterable into ascii representation.
+
+    Unlike :func:`translate_to_ascii`, the values are not modified in place:
+    the transliterated values are yielded in order, so that large exports
+    can be streamed.  Recently transliterated strings are cached, which pays
+    off for repeated author and affiliation names.
+
+    :param values: iterable of strings to transform
+    :param workers: number of processes; by default the values are
+        transliterated in the current process
+    :param chunksize: number of values sent to a worker at once
+    :param pool: existing :class:`multiprocessing.Pool` to use
+    :return: iterator over values transformed to ascii
+    """
+    return _imap(_translate_value_to_ascii, values, workers, chunksize, pool)
+
+
+@memoize(maxsize=CFG_TRANSLITERATION_CACHE_SIZE)
+def _translate_value_to_ascii(value):
+    """Transliterate one string into ascii, see :func:`translate_to_ascii`."""
+    if not value:
+        return value
+    unicode_text = decode_to_unicode(value)
+    if u"[?]" in unicode_text:
+        decoded_text = []
+        for unicode_char in unicode_text:
+            decoded_char = unidecode(unicode_char)
+            # Skip unrecognized characters
+            if decoded_char != "[?]":
+                decoded_text.append(decoded_char)
+        return ''.join(decoded_text).encode('ascii')
+    return unidecode(unicode_text).replace(u"[?]", u"").encode('ascii')
+
+
+def _imap(function, values, workers, chunksize, pool):
+    """Yield the function results for the values in order.
+
+    The values are processed in the current process unless a pool or more
+    than one worker is given.
+    """
+    if pool is None and workers <= 1:
+        for value in values:
+            yield function(value)
+        return
+    own_pool = pool is None
+    if own_pool:
+        pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap(function, values, chunksize):
+            yield result
+    finally:
+        if own_pool:
+            pool.terminate()
+            pool.join()
+
+
+RE_XML_ENTITY = re.compile(r"&#?\w+;")
+
+CFG_XML_ENTITIES_CACHE_SIZE = 4096
+"""Maximum number of resolved references kept for each ``skip`` set."""
+
+_XML_ENTITIES_TABLES = {}
+
+
 def xml_entities_to_utf8(text, skip=('lt', 'gt', 'amp')):
     """Translate HTML or XML character references to UTF-8.
 
@@ -692,28 +1403,71 @@ def xml_entities_to_utf8(text, skip=('lt', 'gt', 'amp')):
     :return: The plain text, as a Unicode string, if necessary.
     @author: Based on http://effbot.org/zone/re-sub.htm#unescape-html
     """
-    def fixup(m):
-        text = m.group(0)
-        if text[:2] == "&#":
-            # character reference
-            try:
-                if text[:3] == "&#x":
-                    return unichr(int(text[3:-1], 16)).encode("utf-8")
-                else:
-                    return unichr(int(text[2:-1])).encode("utf-8")
-            except ValueError:
-                pass
-        else:
-            # named entity
-            if text[1:-1] not in skip:
-                try:
-                    text = unichr(
-                        html_entities.name2codepoint[text[1:-1]]) \
-                        .encode("utf-8")
-                except KeyError:
-                    pass
-        return text  # leave as is
-    return re.sub("&#?\w+;", fixup, text)
+    return _replace_entities(text, skip, "utf-8")
+
+
+def _xml_entities_to_unicode(text, skip=('lt', 'gt', 'amp')):
+    """Unicode version of :func:`xml_entities_to_utf8`."""
+    return _replace_entities(text, skip, None)
+
+
+def _replace_entities(text, skip, encoding):
+    """Replace the references of the text using cached resolutions.
+
+    :param skip: entity names to leave untouched
+    :param encoding: encoding of the replacements, None for Unicode
+    """
+    if '&' not in text:
+        return text
+    try:
+        table = _XML_ENTITIES_TABLES[skip, encoding]
+    except KeyError:
+        table = _XML_ENTITIES_TABLES[skip, encoding] = {}
+    except TypeError:
+        # skip is not hashable, e.g. a list
+        return _replace_entities(text, tuple(skip), encoding)
+
+    def fixup(match):
+        entity = match.group()
+        try:
+            return table[entity]
+        except KeyError:
+            pass
+        replacement = _resolve_entity(entity, skip)
+        if replacement is None:
+            replacement = entity  # leave as is
+        elif encoding is not None:
+            replacement = replacement.encode(encoding)
+        if len(table) < CFG_XML_ENTITIES_CACHE_SIZE:
+            table[entity] = replacement
+        return replacement
+    return RE_XML_ENTITY.sub(fixup, text)
+
+
+def _resolve_entity(entity, skip):
+    """Return the character of an entity or character reference.
+
+    :param entity: reference such as ``&amp;``, ``&#38;`` or ``&#x26;``
+    :param skip: entity names to leave untouched
+    :return: Unicode character, or None if the reference is skipped or
+        unknown
+    """
+    if entity[:2] == "&#":
+        # character reference
+        try:
+            if entity[:3] == "&#x":
+                return unichr(int(entity[3:-1], 16))
+            else:
+                return unichr(int(entity[2:-1]))
+        except ValueError:
+            return None
+    # named entity
+    if entity[1:-1] not in skip:
+        try:
+            return unichr(html_entities.name2codepoint[entity[1:-1]])
+        except KeyError:
+            pass
+    return None
 
 
 def strip_accents(x):
@@ -727,67 +1481,65 @@ def strip_accents(x):
 
     :return: Return such a stripped X.
     """
-    x = re_latex_lowercase_a.sub("a", x)
-    x = re_latex_lowercase_ae.sub("ae", x)
-    x = re_latex_lowercase_oe.sub("oe", x)
-    x = re_latex_lowercase_e.sub("e", x)
-    x = re_latex_lowercase_i.sub("i", x)
-    x = re_latex_lowercase_o.sub("o", x)
-    x = re_latex_lowercase_u.sub("u", x)
-    x = re_latex_lowercase_y.sub("x", x)
-    x = re_latex_lowercase_c.sub("c", x)
-    x = re_latex_lowercase_n.sub("n", x)
-    x = re_latex_uppercase_a.sub("A", x)
-    x = re_latex_uppercase_ae.sub("AE", x)
-    x = re_latex_uppercase_oe.sub("OE", x)
-    x = re_latex_uppercase_e.sub("E", x)
-    x = re_latex_uppercase_i.sub("I", x)
-    x = re_latex_uppercase_o.sub("O", x)
-    x = re_latex_uppercase_u.sub("U", x)
-    x = re_latex_uppercase_y.sub("Y", x)
-    x = re_latex_uppercase_c.sub("C", x)
-    x = re_latex_uppercase_n.sub("N", x)
+    x = re_latex_accents.sub(_strip_latex_accent, x)
 
     # convert input into Unicode string:
     try:
         y = unicode(x, "utf-8")
     except Exception:
         return x  # something went wrong, probably the input wasn't UTF-8
-    # asciify Latin-1 lowercase characters:
-    y = re_unicode_lowercase_a.sub("a", y)
-    y = re_unicode_lowercase_ae.sub("ae", y)
-    y = re_unicode_lowercase_oe.sub("oe", y)
-    y = re_unicode_lowercase_e.sub("e", y)
-    y = re_unicode_lowercase_i.sub("i", y)
-    y = re_unicode_lowercase_o.sub("o", y)
-    y = re_unicode_lowercase_u.sub("u", y)
-    y = re_unicode_lowercase_y.sub("y", y)
-    y = re_unicode_lowercase_c.sub("c", y)
-    y = re_unicode_lowercase_n.sub("n", y)
-    y = re_unicode_lowercase_ss.sub("ss", y)
-    # asciify Latin-1 uppercase characters:
-    y = re_unicode_uppercase_a.sub("A", y)
-    y = re_unicode_uppercase_ae.sub("AE", y)
-    y = re_unicode_uppercase_oe.sub("OE", y)
-    y = re_unicode_uppercase_e.sub("E", y)
-    y = re_unicode_uppercase_i.sub("I", y)
-    y = re_unicode_uppercase_o.sub("O", y)
-    y = re_unicode_uppercase_u.sub("U", y)
-    y = re_unicode_uppercase_y.sub("Y", y)
-    y = re_unicode_uppercase_c.sub("C", y)
-    y = re_unicode_uppercase_n.sub("N", y)
-    # return UTF-8 representation of the Unicode string:
-    return y.encode("utf-8")
+    # asciify Latin-1 characters and return UTF-8 representation:
+    return y.translate(_LATIN1_ACCENTS_TABLE).encode("utf-8")
+
+
+def _strip_accents(text):
+    """Unicode version of :func:`strip_accents`."""
+    return re_latex_accents.sub(_strip_latex_accent, text).translate(
+        _LATIN1_ACCENTS_TABLE)
+
+
+def strip_accents_many(values):
+    """Strip accents in every phrase of the input sequence.
+
+    :param values: iterable of phrases, such as author names
+    :return: list of stripped phrases, see :func:`strip_accents`
+    """
+    return [strip_accents(value) for value in values]
+
+
+def _strip_latex_accent(match):
+    """Return the unaccented letter of a ``re_latex_accents`` match."""
+    letter = match.group(match.lastindex)
+    return _LATEX_ACCENTS_REPLACEMENTS.get(letter, letter)
 
 _punct_re = re.compile(r'[\t !"#$%&\'()*\-/<=>?@\[\\\]^_`{|},.]+')
 
+_SLUG_ASCII_TABLE = ''.join(
+    ' ' if _punct_re.match(chr(code)) else chr(code) for code in range(256))
+
 
 def slugify(text, delim=u'-'):
     """Generate an ASCII-only slug."""
-    result = []
-    for word in _punct_re.split(text.lower()):
-        result.extend(unidecode(word).split())
-    return unicode(delim.join(result))
+    text = text.lower()
+    try:
+        # ASCII text needs no transliteration and its punctuation can be
+        # translated to spaces in the encoded text
+        words = text.encode('ascii').translate(_SLUG_ASCII_TABLE).split()
+    except UnicodeError:
+        words = []
+        for word in _punct_re.split(text):
+            words.extend(unidecode(word).split())
+    return unicode(delim.join(words))
+
+
+def slugify_many(values, delim=u'-'):
+    """Generate a slug for every string of the input sequence.
+
+    :param values: iterable of strings, such as titles
+    :param delim: delimiter of the words of a slug
+    :return: list of slugs, see :func:`slugify`
+    """
+    return [slugify(value, delim) for value in values]
 
 
 def show_diff(original, modified, prefix='', suffix='',
@@ -796,7 +1548,10 @@ def show_diff(original, modified, prefix='', suffix='',
               prefix_removed='-',
               suffix_removed='',
               prefix_added='+',
-              suffix_added=''):
+              suffix_added='',
+              algorithm='differ',
+              max_lines=None,
+              max_edits=None):
     """Return the diff view between original and modified strings.
 
     Function checks both arguments line by line and returns a string
@@ -815,30 +1570,242 @@ def show_diff(original, modified, prefix='', suffix='',
     :param suffix_removed: suffix of the removed line
     :param prefix_added: prefix of the added line
     :param suffix_added: suffix of the added line
+    :param algorithm: ``'differ'`` to pair similar lines with
+        :class:`difflib.Differ`, or ``'myers'`` for a minimal line diff
+        computed in linear space, which scales to large records
+    :param max_lines: maximum number of compared lines to show, a
+        truncated comparison ends with an unchanged ``...`` line
+    :param max_edits: maximum number of edits the ``'myers'`` algorithm
+        looks for in a changed block, a block needing more is shown as
+        removed and added as a whole
 
     :return: string with the comparison of the records
     :rtype: string
     """
-    import difflib
-    differ = difflib.Differ()
-
     result = [prefix]
-    for line in differ.compare(modified.splitlines(), original.splitlines()):
-        if line[0] == ' ':
-            # Mark as unchanged
-            result.append(
-                prefix_unchanged + line[2:].strip() + suffix_unchanged)
-        elif line[0] == '-':
-            # Mark as removed
-            result.append(prefix_removed + line[2:].strip() + suffix_removed)
-        elif line[0] == '+':
-            # Mark as added/modified
-            result.append(prefix_added + line[2:].strip() + suffix_added)
-
+    result.extend(iter_show_diff(original, modified,
+                                 prefix_unchanged=prefix_unchanged,
+                                 suffix_unchanged=suffix_unchanged,
+                                 prefix_removed=prefix_removed,
+                                 suffix_removed=suffix_removed,
+                                 prefix_added=prefix_added,
+                                 suffix_added=suffix_added,
+                                 algorithm=algorithm,
+                                 max_lines=max_lines,
+                                 max_edits=max_edits))
     result.append(suffix)
     return '\n'.join(result)
 
 
+def iter_show_diff(original, modified,
+                   prefix_unchanged=' ',
+                   suffix_unchanged='',
+                   prefix_removed='-',
+                   suffix_removed='',
+                   prefix_added='+',
+                   suffix_added='',
+                   algorithm='differ',
+                   max_lines=None,
+                   max_edits=None):
+    """Yield the lines of :func:`show_diff` as soon as they are known.
+
+    The output prefix and suffix are not included.
+    """
+    if algorithm == 'differ':
+        import difflib
+        lines = difflib.Differ().compare(modified.splitlines(),
+                                         original.splitlines())
+    elif algorithm == 'myers':
+        lines = _myers_diff(modified.splitlines(), original.splitlines(),
+                            max_edits)
+    else:
+        raise ValueError('Unknown diff algorithm: %r' % (algorithm, ))
+
+    affixes = {
+        ' ': (prefix_unchanged, suffix_unchanged),
+        '-': (prefix_removed, suffix_removed),
+        '+': (prefix_added, suffix_added),
+    }
+    count = 0
+    for line in lines:
+        if line[0] in affixes:
+            if count == max_lines:
+                yield prefix_unchanged + '...' + suffix_unchanged
+                return
+            line_prefix, line_suffix = affixes[line[0]]
+            yield line_prefix + line[2:].strip() + line_suffix
+            count += 1
+
+
+def _myers_diff(a, b, max_edits=None):
+    """Yield the lines of a diff of ``a`` to ``b`` in the format of ``Differ``.
+
+    Common prefixes and suffixes are skipped and the lines occurring once
+    on both sides are matched first, as in patience diff.  The remaining
+    regions are split by the middle snakes of Myers' algorithm, so memory
+    stays linear and unchanged lines are yielded early.  A region needing
+    more than ``max_edits`` edits is shown as replaced as a whole.
+    """
+    # compare small integers instead of lines
+    ids = {}
+    a_ids = [ids.setdefault(line, len(ids)) for line in a]
+    b_ids = [ids.setdefault(line, len(ids)) for line in b]
+
+    # (alo, ahi, blo, bhi) regions to compare, or (alo, ahi) unchanged lines
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        task = stack.pop()
+        if len(task) == 2:
+            for i in range(*task):
+                yield '  ' + a[i]
+            continue
+        alo, ahi, blo, bhi = task
+        while alo < ahi and blo < bhi and a_ids[alo] == b_ids[blo]:
+            yield '  ' + a[alo]
+            alo += 1
+            blo += 1
+        suffix_end = ahi
+        while alo < ahi and blo < bhi and a_ids[ahi - 1] == b_ids[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+        if ahi < suffix_end:
+            stack.append((ahi, suffix_end))
+        if alo == ahi or blo == bhi:
+            for i in range(alo, ahi):
+                yield '- ' + a[i]
+            for i in range(blo, bhi):
+                yield '+ ' + b[i]
+            continue
+
+        anchors = _patience_anchors(a_ids, alo, ahi, b_ids, blo, bhi)
+        if anchors:
+            for i, j in reversed(anchors):
+                stack.append((i + 1, ahi, j + 1, bhi))
+                stack.append((i, i + 1))
+                ahi, bhi = i, j
+            stack.append((alo, ahi, blo, bhi))
+            continue
+
+        split = _myers_middle_snake(a_ids, alo, ahi, b_ids, blo, bhi,
+                                    max_edits)
+        if split is None:
+            for i in range(alo, ahi):
+                yield '- ' + a[i]
+            for i in range(blo, bhi):
+                yield '+ ' + b[i]
+        else:
+            x, y = split
+            stack.append((x, ahi, y, bhi))
+            stack.append((alo, x, blo, y))
+
+
+def _patience_anchors(a, alo, ahi, b, blo, bhi):
+    """Return the longest ordered list of pairs of lines unique to both.
+
+    The pairs of indexes are those of lines occurring exactly once in each
+    region, and are found by patience sorting.
+    """
+    a_index = {}
+    for i in range(alo, ahi):
+        a_index[a[i]] = -1 if a[i] in a_index else i
+    b_index = {}
+    for j in range(blo, bhi):
+        b_index[b[j]] = -1 if b[j] in b_index else j
+    pairs = [(i, b_index.get(a[i], -1)) for i in range(alo, ahi)
+             if a_index[a[i]] == i]
+    pairs = [pair for pair in pairs if pair[1] != -1]
+
+    tails = []
+    tail_pairs = []
+    previous = []
+    for k, (i, j) in enumerate(pairs):
+        pile = bisect.bisect_left(tails, j)
+        if pile == len(tails):
+            tails.append(j)
+            tail_pairs.append(k)
+        else:
+            tails[pile] = j
+            tail_pairs[pile] = k
+        previous.append(tail_pairs[pile - 1] if pile else -1)
+
+    anchors = []
+    k = tail_pairs[-1] if tail_pairs else -1
+    while k != -1:
+        anchors.append(pairs[k])
+        k = previous[k]
+    anchors.reverse()
+    return anchors
+
+
+def _myers_middle_snake(a, alo, ahi, b, blo, bhi, max_edits=None):
+    """Return the point splitting a minimal diff of two regions in two.
+
+    The forward and reverse searches of Myers' algorithm are run until
+    they overlap.  Return None if the regions have nothing in common or
+    need more than ``max_edits`` edits.
+    """
+    n = ahi - alo
+    m = bhi - blo
+    max_d = (n + m + 1) // 2
+    if max_edits is not None:
+        max_d = min(max_d, max_edits + 1)
+    v_offset = max_d
+    v_length = 2 * max_d + 2
+    v1 = [-1] * v_length
+    v1[v_offset + 1] = 0
+    v2 = list(v1)
+    delta = n - m
+    # with an odd delta the paths overlap during the forward search
+    front = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+    for d in range(max_d):
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = v_offset + k1
+            if k1 == -d or (k1 != d and
+                            v1[k1_offset - 1] < v1[k1_offset + 1]):
+                x1 = v1[k1_offset + 1]
+            else:
+                x1 = v1[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[alo + x1] == b[blo + y1]:
+                x1 += 1
+                y1 += 1
+            v1[k1_offset] = x1
+            if x1 > n:
+                k1end += 2
+            elif y1 > m:
+                k1start += 2
+            elif front:
+                k2_offset = v_offset + delta - k1
+                if 0 <= k2_offset < v_length and v2[k2_offset] != -1 and \
+                        x1 >= n - v2[k2_offset]:
+                    return alo + x1, blo + y1
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = v_offset + k2
+            if k2 == -d or (k2 != d and
+                            v2[k2_offset - 1] < v2[k2_offset + 1]):
+                x2 = v2[k2_offset + 1]
+            else:
+                x2 = v2[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and \
+                    a[ahi - x2 - 1] == b[bhi - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            v2[k2_offset] = x2
+            if x2 > n:
+                k2end += 2
+            elif y2 > m:
+                k2start += 2
+            elif not front:
+                k1_offset = v_offset + delta - k2
+                if 0 <= k1_offset < v_length and v1[k1_offset] != -1:
+                    x1 = v1[k1_offset]
+                    if x1 >= n - x2:
+                        return alo + x1, blo + x1 - (k1_offset - v_offset)
+    return None
+
+
 def transliterate_ala_lc(value):
     """Transliterate a string.
 
@@ -856,8 +1823,41 @@ def transliterate_ala_lc(value):
     """
     if not value:
         return value
-    text = unidecode(value)
-    return text
+    return _transliterate_value(value)
+
+
+def transliterate_ala_lc_many(values, workers=1, chunksize=256, pool=None):
+    """Transliterate every string of an iterable.
+
+    See :func:`transliterate_ala_lc` and, for the other parameters,
+    :func:`translate_to_ascii_many`.
+
+    :param values: iterable of strings to transform
+    :return: iterator over transliterated strings
+    """
+    return _imap(transliterate_ala_lc, values, workers, chunksize, pool)
+
+
+@memoize(maxsize=CFG_TRANSLITERATION_CACHE_SIZE)
+def _transliterate_value(value):
+    """Return cached unidecode transliteration of the value."""
+    return unidecode(value)
+
+
+_LATEX_ESCAPES = {
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\~{}',
+    '^': r'\^{}',
+    '\\': r'\textbackslash{}',
+}
+_LATEX_SPECIAL_CHARS = ''.join(_LATEX_ESCAPES)
+_RE_LATEX_SPECIAL_CHARS = re.compile(r'[&%$#_{}~^\\]')
 
 
 def escape_latex(text):
@@ -866,18 +1866,146 @@ def escape_latex(text):
     This function takes the given text and escapes characters
     that have a special meaning in LaTeX: # $ % ^ & _ { } ~ \
     """
-    text = unicode(text.decode('utf-8'))
-    CHARS = {
-        '&': r'\&',
-        '%': r'\%',
-        '$': r'\$',
-        '#': r'\#',
-        '_': r'\_',
-        '{': r'\{',
-        '}': r'\}',
-        '~': r'\~{}',
-        '^': r'\^{}',
-        '\\': r'\textbackslash{}',
-    }
-    escaped = "".join([CHARS.get(char, char) for char in text])
-    return escaped.encode('utf-8')
+    if isinstance(text, unicode):
+        text = text.decode('utf-8').encode('utf-8')
+    else:
+        # only validated, the special characters are ASCII and can be
+        # escaped in the encoded text
+        text.decode('utf-8')
+    if len(text.translate(None, _LATEX_SPECIAL_CHARS)) == len(text):
+        return text
+    return _escape_latex(text)
+
+
+def escape_latex_many(values):
+    """Escape LaTeX special characters of every string of the sequence.
+
+    :param values: iterable of UTF-8 encoded strings
+    :return: list of escaped strings, see :func:`escape_latex`
+    """
+    return [escape_latex(value) for value in values]
+
+
+def _escape_latex(text):
+    """Escape LaTeX special characters of a Unicode or encoded string."""
+    return _RE_LATEX_SPECIAL_CHARS.sub(_escape_latex_char, text)
+
+
+def _escape_latex_char(match):
+    """Return the escape sequence of a LaTeX special character."""
+    return _LATEX_ESCAPES[match.group()]
+
+
+class TextPipeline(object):
+
+    """Chain of text normalization steps applied on a Unicode string.
+
+    The helpers of this module each decode their input from UTF-8 and
+    encode the result back.  A pipeline decodes the text once, runs every
+    step on the Unicode string and encodes the result at the end::
+
+        normalize = (TextPipeline().wash_for_utf8().xml_entities_to_utf8()
+                     .translate_latex2unicode().remove_line_breaks()
+                     .wash_for_xml())
+        normalize('Ern&#246; $\\alpha$')
+        records = normalize.map_records(records, fields=('title', ))
+
+    Adding a step returns a new pipeline, so pipelines can be shared and
+    extended freely.
+    """
+
+    def __init__(self, steps=(), errors='strict', encoding='utf-8'):
+        """Initialise the pipeline.
+
+        :param steps: functions taking and returning a Unicode string
+        :param errors: how to handle input that is not valid UTF-8, see
+            :meth:`str.decode`
+        :param encoding: encoding of the results, ``None`` to return
+            Unicode strings
+        """
+        self.steps = tuple(steps)
+        self.errors = errors
+        self.encoding = encoding
+
+    def _replace(self, step=None, **kwargs):
+        """Return a copy of the pipeline with an additional step."""
+        options = dict(errors=self.errors, encoding=self.encoding)
+        options.update(kwargs)
+        steps = self.steps if step is None else self.steps + (step, )
+        return TextPipeline(steps, **options)
+
+    def then(self, function, *args, **kwargs):
+        """Add a custom step taking and returning a Unicode string."""
+        if args or kwargs:
+            function = functools.partial(function, *args, **kwargs)
+        return self._replace(function)
+
+    def wash_for_utf8(self):
+        """Drop invalid UTF-8 sequences, see :func:`wash_for_utf8`."""
+        return self._replace(errors='ignore')
+
+    def to_unicode(self):
+        """Return Unicode strings instead of UTF-8 encoded ones."""
+        return self._replace(encoding=None)
+
+    def xml_entities_to_utf8(self, skip=('lt', 'gt', 'amp')):
+        """Add :func:`xml_entities_to_utf8` step."""
+        return self.then(_xml_entities_to_unicode, skip=skip)
+
+    def translate_latex2unicode(self, kb_file=None):
+        """Add :func:`translate_latex2unicode` step."""
+        return self.then(_latex2unicode, kb_file=kb_file)
+
+    def remove_line_breaks(self):
+        """Add :func:`remove_line_breaks` step."""
+        return self.then(_remove_line_breaks)
+
+    def escape_latex(self):
+        """Add :func:`escape_latex` step."""
+        return self.then(_escape_latex)
+
+    def wash_for_xml(self, xml_version='1.0'):
+        """Add :func:`wash_for_xml` step."""
+        return self.then(_wash_for_xml, xml_version=xml_version)
+
+    def strip_accents(self):
+        """Add :func:`strip_accents` step."""
+        return self.then(_strip_accents)
+
+    def __call__(self, text):
+        """Run all steps on the text.
+
+        :param text: UTF-8 encoded or Unicode string
+        :return: normalized string
+        """
+        if not isinstance(text, unicode):
+            text = text.decode('utf-8', self.errors)
+        for step in self.steps:
+            text = step(text)
+        if self.encoding is not None:
+            return text.encode(self.encoding)
+        return text
+
+    def map(self, texts):
+        """Normalize every text of an iterable, lazily.
+
+        :param texts: iterable of strings
+        :return: iterator over normalized strings
+        """
+        for text in texts:
+            yield self(text)
+
+    def map_records(self, records, fields):
+        """Normalize fields of every record of an iterable, lazily.
+
+        :param records: iterable of dictionaries
+        :param fields: keys of the values to normalize; missing keys and
+            empty values are left untouched
+        :return: iterator over shallow copies of the records
+        """
+        for record in records:
+            record = dict(record)
+            for field in fields:
+                if record.get(field):
+                    record[field] = self(record[field])
+            yield record
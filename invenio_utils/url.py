@@ -302,24 +302,27 @@ def create_html_link(urlbase, urlargd, link_label, linkattrd=None,
                            attributes (e.g. < becomes &lt; or " becomes &quot;)
     @param urlhash: hash string to add at the end of the link
     """
-    attributes_separator = ' '
     output = '<a href="' + \
              create_url(urlbase, urlargd, escape_urlargd, urlhash) + '"'
     if linkattrd:
-        output += ' '
-        if escape_linkattrd:
-            attributes = [escape(str(key), quote=True) + '="' +
-                          escape(str(linkattrd[key]), quote=True) + '"'
-                          for key in linkattrd.keys()]
-        else:
-            attributes = [str(key) + '="' + str(linkattrd[key]) + '"'
-                          for key in linkattrd.keys()]
-        output += attributes_separator.join(attributes)
+        output += ' ' + _format_link_attributes(linkattrd, escape_linkattrd)
     output = wash_for_utf8(output)
     output += '>' + wash_for_utf8(link_label) + '</a>'
     return output
 
 
+def _format_link_attributes(linkattrd, escape_linkattrd=True):
+    """Return the attributes of an HTML link separated by spaces."""
+    if escape_linkattrd:
+        attributes = [escape(str(key), quote=True) + '="' +
+                      escape(str(linkattrd[key]), quote=True) + '"'
+                      for key in linkattrd.keys()]
+    else:
+        attributes = [str(key) + '="' + str(linkattrd[key]) + '"'
+                      for key in linkattrd.keys()]
+    return ' '.join(attributes)
+
+
 def create_html_mailto(
         email,
         subject=None,
@@ -524,21 +527,177 @@ def create_url(urlbase, urlargd, escape_urlargd=True, urlhash=None):
                            arguments (e.g. < becomes &lt; or " becomes &quot;)
     @param urlhash: hash string to add at the end of the link
     """
-    separator = '&amp;'
-    output = urlbase
+    output = [urlbase]
     if urlargd:
-        output += '?'
-        if escape_urlargd:
-            arguments = [escape(quote(str(key)), quote=True) + '=' +
-                         escape(quote(str(urlargd[key])), quote=True)
-                         for key in urlargd.keys()]
-        else:
-            arguments = [str(key) + '=' + str(urlargd[key])
-                         for key in urlargd.keys()]
-        output += separator.join(arguments)
+        output.append('?')
+        quote_argument = _quote_url_argument if escape_urlargd else str
+        separator = ''
+        for key in urlargd.keys():
+            output += (separator, quote_argument(key), '=',
+                       quote_argument(urlargd[key]))
+            separator = '&amp;'
     if urlhash:
-        output += "#" + escape(quote(str(urlhash)))
-    return output
+        output.append("#" + escape(quote(str(urlhash))))
+    return ''.join(output)
+
+
+CFG_URL_ARGUMENT_CACHE_SIZE = 4096
+"""Maximum number of quoted string arguments kept by
+:func:`_quote_url_argument`."""
+
+_QUOTED_URL_ARGUMENTS = {}
+
+
+def _quote_url_argument(value):
+    """Return the argument quoted and escaped for an HTML attribute.
+
+    Integers need no quoting and strings, such as argument names or
+    collection names, are quoted once and cached.
+    """
+    value_type = type(value)
+    if value_type is int or value_type is long:
+        return str(value)
+    if value_type is not str and value_type is not unicode:
+        return escape(quote(str(value)), quote=True)
+    quoted = _QUOTED_URL_ARGUMENTS.get(value)
+    if quoted is None:
+        quoted = escape(quote(str(value)), quote=True)
+        if len(_QUOTED_URL_ARGUMENTS) < CFG_URL_ARGUMENT_CACHE_SIZE:
+            _QUOTED_URL_ARGUMENTS[value] = quoted
+    return quoted
+
+
+class URLTemplate(object):
+
+    """Compiled URL whose arguments are mostly constant.
+
+    Result pages create thousands of links which differ only in a few
+    arguments, such as ``recid``.  The base URL, the constant arguments and
+    the link attributes are quoted once; rendering only quotes the values
+    of the ``variables``::
+
+        detailed = URLTemplate(CFG_SITE_URL + '/search', {'of': 'hd'},
+                               variables=('recid', ))
+        detailed.url({'recid': 12})
+        buffer = []
+        for recid, title in hits:
+            detailed.write_html_link(buffer, {'recid': recid}, title)
+        page = ''.join(buffer)
+
+    The output is the one of :func:`create_url` and
+    :func:`create_html_link` for the dictionary of all the arguments.
+    """
+
+    def __init__(self, urlbase, urlargd=None, variables=(), linkattrd=None,
+                 escape_urlargd=True, escape_linkattrd=True, urlhash=None):
+        """Quote the constant parts of the URL and of the HTML link.
+
+        @param urlbase: base url (e.g. config.CFG_SITE_URL/search)
+        @param urlargd: dictionary of the constant parameters
+        @param variables: names of the parameters given at rendering time;
+                          they override the constant parameters
+        @param linkattrd: dictionary of attributes of the HTML links
+        @param escape_urlargd: boolean indicating if the function should
+                               escape arguments, see :func:`create_url`
+        @param escape_linkattrd: boolean indicating if the function should
+                                 escape attributes
+        @param urlhash: hash string to add at the end of the URL
+        """
+        self.escape_urlargd = escape_urlargd
+        self._quote_argument = _quote_url_argument if escape_urlargd \
+            else str
+        arguments = dict(urlargd or {})
+        arguments.update(dict.fromkeys(variables))
+        variables = frozenset(variables)
+
+        # the URL is a list of constant parts, each followed by the name of
+        # the variable rendered after it (None for the last part)
+        parts = []
+        chunk = [urlbase]
+        if arguments:
+            chunk.append('?')
+            separator = ''
+            for key in arguments.keys():
+                chunk += (separator, self._quote_argument(key), '=')
+                if key in variables:
+                    parts.append((''.join(chunk), key))
+                    chunk = []
+                else:
+                    chunk.append(self._quote_argument(arguments[key]))
+                separator = '&amp;'
+        if urlhash:
+            chunk.append("#" + escape(quote(str(urlhash))))
+        parts.append((''.join(chunk), None))
+        self._url_parts = parts
+
+        self._link_suffix = '"'
+        if linkattrd:
+            self._link_suffix += ' ' + _format_link_attributes(
+                linkattrd, escape_linkattrd)
+        # raise the errors of create_html_link for the concatenation of
+        # the base URL, the arguments and the attributes
+        dummy = '<a href="' + ''.join(part for part, name in parts) + \
+            self._link_suffix
+
+        # escaped values are ASCII and the constant parts are delimited by
+        # ASCII characters, so the parts can be washed one by one
+        link_parts = [(wash_for_utf8(part), name) for part, name in parts]
+        link_parts[0] = ('<a href="' + link_parts[0][0], link_parts[0][1])
+        link_parts[-1] = (link_parts[-1][0] +
+                          wash_for_utf8(self._link_suffix) + '>', None)
+        self._link_parts = link_parts
+
+    def url(self, values=None):
+        """Return the URL, see :func:`create_url`.
+
+        @param values: dictionary of the values of the variables
+        """
+        output = []
+        self._write(output, self._url_parts, values)
+        return ''.join(output)
+
+    def write_url(self, buffer, values=None):
+        """Append the URL to a list of strings.
+
+        @param buffer: list of strings, joined by the caller
+        @param values: dictionary of the values of the variables
+        """
+        self._write(buffer, self._url_parts, values)
+
+    def html_link(self, values, link_label):
+        """Return the HTML link, see :func:`create_html_link`.
+
+        @param values: dictionary of the values of the variables
+        @param link_label: text displayed in a browser (has to be already
+                           escaped)
+        """
+        output = []
+        self.write_html_link(output, values, link_label)
+        return ''.join(output)
+
+    def write_html_link(self, buffer, values, link_label):
+        """Append the HTML link to a list of strings.
+
+        @param buffer: list of strings, joined by the caller
+        @param values: dictionary of the values of the variables
+        @param link_label: text displayed in a browser (has to be already
+                           escaped)
+        """
+        if self.escape_urlargd:
+            self._write(buffer, self._link_parts, values)
+        else:
+            buffer.append(wash_for_utf8(
+                '<a href="' + self.url(values) + self._link_suffix) + '>')
+        buffer += (wash_for_utf8(link_label), '</a>')
+
+    def _write(self, buffer, parts, values):
+        """Append the parts and the quoted values of the variables."""
+        append = buffer.append
+        quote_argument = self._quote_argument
+        for part, name in parts:
+            append(part)
+            if name is not None:
+                append(quote_argument(values[name]))
 
 
 def same_urls_p(a, b):
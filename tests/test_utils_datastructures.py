@@ -202,6 +202,25 @@ class TestLazyDictionaries(InvenioTestCase):
         laziest_dict2 = LaziestDict()
         self.assertFalse('foo2' in laziest_dict2)
 
+    def test_lazy_cache_stats(self):
+        lazy_dict = LazyDict(lambda: {'foo': 'bar'})
+        laziest_dict = LaziestDict(lambda k: k * 2)
+        self.assertEqual(lazy_dict.cache_stats()['entries'], 0)
+
+        lazy_dict['foo']
+        lazy_dict['foo']
+        laziest_dict['a']
+        laziest_dict['a']
+        laziest_dict['b']
+
+        stats = lazy_dict.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']),
+                         (1, 1, 1))
+        self.assertTrue(stats['memory'] > 0)
+        stats = laziest_dict.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']),
+                         (1, 2, 2))
+
 
 class TestSmartDict(InvenioTestCase):
 
@@ -39,3 +39,283 @@ class MemoiseTest(InvenioTestCase):
         from invenio_utils.memoise import Memoise
         fib_memoised = Memoise(fib)
         self.assertEqual(fib(17), fib_memoised(17))
+
+    def test_memoise_lru_eviction(self):
+        """memoiseutil - test least recently used entries are evicted."""
+        from invenio_utils.memoise import Memoise
+        calls = []
+
+        def square(n):
+            calls.append(n)
+            return n * n
+
+        square_memoised = Memoise(square, maxsize=2)
+        square_memoised(1)
+        square_memoised(2)
+        square_memoised(1)
+        square_memoised(3)
+        square_memoised(1)
+        square_memoised(2)
+        self.assertEqual(calls, [1, 2, 3, 2])
+        info = square_memoised.cache_info()
+        self.assertEqual(info.hits, 2)
+        self.assertEqual(info.misses, 4)
+        self.assertEqual(info.evictions, 2)
+        self.assertEqual(info.currsize, 2)
+        square_memoised.cache_clear()
+        self.assertEqual(square_memoised.cache_info().currsize, 0)
+
+    def test_memoise_ttl(self):
+        """memoiseutil - test expired entries are recomputed."""
+        from invenio_utils.memoise import LRUCache
+        now = [0]
+        cache = LRUCache(ttl=10, timer=lambda: now[0])
+        cache['a'] = 1
+        now[0] = 5
+        self.assertEqual(cache.get('a'), 1)
+        now[0] = 10
+        self.assertEqual(cache.get('a'), None)
+        self.assertFalse('a' in cache)
+
+    def test_memoize_decorator(self):
+        """memoiseutil - test memoize with and without arguments."""
+        from invenio_utils.memoise import memoize
+        calls = []
+
+        @memoize
+        def add(a, b=0):
+            calls.append((a, b))
+            return a + b
+
+        @memoize(maxsize=1)
+        def neg(a):
+            calls.append(a)
+            return -a
+
+        self.assertEqual(add(1, b=2), 3)
+        self.assertEqual(add(1, b=2), 3)
+        self.assertEqual(neg(1), -1)
+        self.assertEqual(neg(2), -2)
+        self.assertEqual(neg(1), -1)
+        self.assertEqual(calls, [(1, 2), 1, 2, 1])
+        self.assertEqual(add.cache_info().hits, 1)
+        self.assertEqual(neg.cache_info().evictions, 2)
+
+    def test_make_key(self):
+        """memoiseutil - test structural cache keys."""
+        from invenio_utils.memoise import make_key
+        self.assertEqual(make_key((1, 2), {}), make_key((1, 2), {}))
+        self.assertNotEqual(make_key((1, 2), {}), make_key((1, 2.0), {}))
+        self.assertEqual(make_key((1, ), {'b': 2, 'a': 1}),
+                         make_key((1, ), {'a': 1, 'b': 2}))
+        self.assertNotEqual(make_key((1, ), {'a': 1}), make_key((1, 'a', 1), {}))
+        self.assertEqual(make_key(({'b': [1], 'a': 2}, ), {}),
+                         make_key(({'a': 2, 'b': [1]}, ), {}))
+        self.assertNotEqual(make_key(([1], ), {}), make_key(((1, ), ), {}))
+        hash(make_key(([1, {2: set([3])}], ), {'x': {}}))
+
+    def test_memoize_typed(self):
+        """memoiseutil - test equal arguments of different types."""
+        from invenio_utils.memoise import memoize
+
+        @memoize
+        def name(value, other=None):
+            return type(value).__name__, type(other).__name__
+
+        self.assertEqual([name(1), name(1.0), name(True)],
+                         [('int', 'NoneType'), ('float', 'NoneType'),
+                          ('bool', 'NoneType')])
+        self.assertEqual([name('a'), name(u'a')],
+                         [('str', 'NoneType'), ('unicode', 'NoneType')])
+        self.assertEqual([name(1, other=1), name(1, other=1.0)],
+                         [('int', 'int'), ('int', 'float')])
+        self.assertEqual(name(1), ('int', 'NoneType'))
+        self.assertEqual(name.cache_info().hits, 1)
+
+    def test_memoize_unhashable_fallback(self):
+        """memoiseutil - test pluggable fallback for unhashable arguments."""
+        import functools
+        from invenio_utils.memoise import make_key, memoize
+
+        @memoize(key=functools.partial(make_key, fallback=repr))
+        def length(value):
+            return len(value)
+
+        self.assertEqual(length([1, 2]), 2)
+        self.assertEqual(length([1, 2]), 2)
+        self.assertEqual(length.cache_info().hits, 1)
+
+    def test_memoize_single_flight(self):
+        """memoiseutil - test concurrent callers share one computation."""
+        import threading
+        from invenio_utils.memoise import memoize
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        @memoize(single_flight=True)
+        def load(name):
+            calls.append(name)
+            started.set()
+            release.wait(5)
+            return name.upper()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(load('kb')))
+                   for dummy in range(10)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(calls, ['kb'])
+        self.assertEqual(results, ['KB'] * 10)
+
+    def test_single_flight_errors_and_timeout(self):
+        """memoiseutil - test errors reach waiters and waiting times out."""
+        import threading
+        from invenio_utils.memoise import SingleFlight, SingleFlightTimeout
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def fail():
+            started.set()
+            release.wait(5)
+            raise ValueError('broken')
+
+        def call(timeout=None):
+            try:
+                flight.do('key', fail, timeout=timeout)
+            except Exception as e:
+                errors.append(type(e))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(5)
+        call(timeout=0.01)
+        waiter = threading.Thread(target=call)
+        waiter.start()
+        release.set()
+        leader.join()
+        waiter.join()
+        self.assertEqual(sorted(errors, key=lambda e: e.__name__),
+                         [SingleFlightTimeout, ValueError, ValueError])
+
+    def test_single_flight_base_exception(self):
+        """memoiseutil - test waiters re-raise non-Exception errors."""
+        import threading
+        import time
+        from invenio_utils.memoise import SingleFlight
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def shutdown():
+            started.set()
+            release.wait(5)
+            raise SystemExit(1)
+
+        def call():
+            try:
+                errors.append(flight.do('key', shutdown))
+            except SystemExit as e:
+                errors.append(type(e))
+
+        threads = [threading.Thread(target=call) for dummy in range(3)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.1)  # let the other threads wait for the leader
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [SystemExit] * 3)
+
+    def test_sqlite_backend(self):
+        """memoiseutil - test persistent SQLite storage backend."""
+        import os
+        import shutil
+        import tempfile
+        from invenio_utils.memoise import Memoise, SQLiteCache
+        from invenio_utils.serializers import ZlibMarshal
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'cache.db')
+            fib_memoised = Memoise(
+                fib, backend=SQLiteCache(path, maxsize=3,
+                                         serializer=ZlibMarshal))
+            self.assertEqual(fib_memoised(10), fib(10))
+            self.assertEqual(fib_memoised(10), fib(10))
+            for n in range(4):
+                fib_memoised(n)
+            info = fib_memoised.cache_info()
+            self.assertEqual(info.hits, 1)
+            self.assertEqual(info.evictions, 2)
+            self.assertEqual(info.currsize, 3)
+
+            # A new process would see the stored values.
+            cache = SQLiteCache(path, serializer=ZlibMarshal)
+            self.assertEqual(cache.get((3, )), fib(3))
+            self.assertFalse((10, ) in cache)
+            cache.clear()
+            self.assertEqual(len(cache), 0)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_sqlite_backend_equal_keys(self):
+        """memoiseutil - test equal arguments share one SQLite entry."""
+        import os
+        import shutil
+        import tempfile
+        from invenio_utils.memoise import SQLiteCache, memoize
+        tmpdir = tempfile.mkdtemp()
+        calls = []
+        try:
+            cache = SQLiteCache(os.path.join(tmpdir, 'cache.db'))
+
+            @memoize(backend=cache)
+            def join(*args, **kwargs):
+                calls.append(args)
+                return len(args) + len(kwargs)
+
+            text = 'xxxxx'
+            self.assertEqual(join(text, text), 2)
+            self.assertEqual(join('xxxxx', ''.join(['x'] * 5)), 2)
+            self.assertEqual(join(1, 2, x=[text, text]), 3)
+            self.assertEqual(join(long(1), 2, x=['xxxxx', 'x' * 5]), 3)
+            self.assertEqual(join({'a': 1, 'b': 2}), 1)
+            self.assertEqual(join(dict([('b', 2), ('a', 1)])), 1)
+            self.assertEqual(len(calls), 3)
+            self.assertEqual(len(cache), 3)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_dump_cache_stats(self):
+        """memoiseutil - test statistics of registered caches."""
+        from invenio_utils.memoise import dump_cache_stats, memoize
+
+        @memoize
+        def slow_square(n):
+            import time
+            time.sleep(0.01)
+            return n * n
+
+        slow_square(2)
+        slow_square(2)
+        slow_square(3)
+        name = slow_square.__module__ + '.slow_square'
+        stats = [cache_stats for cache_stats in dump_cache_stats()
+                 if cache_stats['name'] == name]
+        self.assertEqual(len(stats), 1)
+        stats = stats[0]
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['entries'], 2)
+        self.assertTrue(stats['memory'] > 0)
+        self.assertTrue(stats['time_saved'] >= 0.01)
@@ -57,3 +57,17 @@ class TestMimeTypeUtils(InvenioTestCase):
         self.assertEqual(file_strip_ext("foo.buz;1;icon", only_known_extensions=True), 'foo.buz;1')
         self.assertEqual(file_strip_ext("foo.buz;1;icon", skip_version=True), 'foo')
         self.assertEqual(file_strip_ext("foo.buz;1;icon", skip_version=True, only_known_extensions=True), 'foo.buz')
+
+    def test_cache_stats(self):
+        """Tests the statistics of the mimetype cache."""
+        from invenio_utils.mimetype import LazyMimeCache
+        cache = LazyMimeCache()
+        self.assertEqual(cache.cache_stats()['entries'], 0)
+        cache.extensions
+        cache.extensions
+        cache.mimes
+        stats = cache.cache_stats()
+        # computing extensions reads mimes three times
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']),
+                         (4, 2, 2))
+        self.assertTrue(stats['memory'] > 0)
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Unit tests for the serializers."""
+
+from invenio_testing import InvenioTestCase
+
+RECORD = {'recid': 1, 'title': u'Higgs boson', 'authors': ['Ellis, J.'] * 3}
+
+
+class FramedSerializerTest(InvenioTestCase):
+
+    """Test framed serializer format."""
+
+    def test_round_trip(self):
+        """serializers - framed round trip with every codec."""
+        from invenio_utils.serializers import CODECS, dumps, is_framed, loads
+        for codec in CODECS:
+            blob = dumps(RECORD, codec=codec)
+            self.assertTrue(is_framed(blob))
+            self.assertEqual(loads(blob), RECORD)
+
+    def test_legacy_blobs(self):
+        """serializers - universal loads reads unframed blobs."""
+        from invenio_utils.serializers import LzmaPickle, ZlibMarshal, \
+            ZlibPickle, loads
+        self.assertEqual(loads(ZlibPickle.dumps(RECORD)), RECORD)
+        self.assertEqual(loads(LzmaPickle.dumps(RECORD)), RECORD)
+        self.assertEqual(loads(ZlibMarshal.dumps(RECORD), legacy=ZlibMarshal),
+                         RECORD)
+
+    def test_errors(self):
+        """serializers - framed corrupted input."""
+        from invenio_utils.serializers import Framed, SerializerError, dumps
+        blob = dumps(RECORD, codec='pickle')
+        self.assertRaises(SerializerError, Framed.loads, blob[:-5])
+        self.assertRaises(SerializerError, Framed.loads, 'not framed')
+        self.assertRaises(SerializerError, dumps, RECORD, codec='unknown')
+
+
+class AdaptiveSerializerTest(InvenioTestCase):
+
+    """Test size-adaptive codec selection."""
+
+    def test_policy(self):
+        """serializers - compression policy thresholds."""
+        from invenio_utils.serializers import CompressionPolicy
+        policy = CompressionPolicy(min_size=100, lzma_min_size=1000)
+        self.assertEqual(policy.choose(10), ('pickle', None))
+        self.assertEqual(policy.choose(500), ('zlib-pickle', 1))
+        self.assertEqual(policy.choose(5000), ('zlib-pickle', 1))
+        self.assertEqual(policy.choose(5000, cold=True), ('lzma-pickle', 6))
+        policy = CompressionPolicy(method='marshal', lzma_min_size=None)
+        self.assertEqual(policy.choose(1 << 30, cold=True),
+                         ('zlib-marshal', 1))
+
+    def test_round_trip(self):
+        """serializers - adaptive round trip."""
+        from invenio_utils.serializers import CODECS, FRAME_HEADER, \
+            Adaptive, CompressionPolicy, loads
+        serializer = Adaptive(CompressionPolicy(min_size=100,
+                                                lzma_min_size=1000))
+        small = [1, 2, 3]
+        large = [dict(RECORD, recid=recid) for recid in range(100)]
+        self.assertEqual(loads(serializer.dumps(small)), small)
+        for cold in (False, True):
+            blob = serializer.dumps(large, cold=cold)
+            self.assertEqual(serializer.loads(blob), large)
+        codec_id = FRAME_HEADER.unpack_from(
+            serializer.dumps(large, cold=True))[1]
+        self.assertEqual(codec_id, CODECS['lzma-pickle'].codec_id)
+
+
+class StreamingSerializerTest(InvenioTestCase):
+
+    """Test chunked dump and load."""
+
+    def test_round_trip(self):
+        """serializers - streaming dump and load."""
+        from io import BytesIO
+        from invenio_utils.serializers import LzmaPickle, ZlibPickle
+        citations = dict((recid, range(recid % 50)) for recid in range(2000))
+        for serializer in (ZlibPickle, LzmaPickle):
+            for protocol in (0, 2):
+                fileobj = BytesIO()
+                serializer.dump(citations, fileobj, protocol=protocol,
+                                chunk_size=1024)
+                blob = fileobj.getvalue()
+                self.assertEqual(serializer.loads(blob), citations)
+                self.assertEqual(
+                    serializer.load(BytesIO(blob), chunk_size=100), citations)
+                self.assertEqual(
+                    serializer.load(BytesIO(serializer.dumps(citations))),
+                    citations)
+
+    def test_sequence(self):
+        """serializers - streaming load of objects following each other."""
+        from io import BufferedReader, BytesIO
+        from invenio_utils.serializers import LzmaPickle, ZlibPickle
+        objects = [range(5000), {'title': 'boson'}, None, 'x' * 100000]
+        for serializer in (ZlibPickle, LzmaPickle):
+            fileobj = BytesIO()
+            for obj in objects:
+                serializer.dump(obj, fileobj, chunk_size=1024)
+            blob = fileobj.getvalue() + b'tail'
+            for chunk_size in (7, 1024, 1 << 16):
+                for fileobj in (BytesIO(blob), BufferedReader(BytesIO(blob))):
+                    self.assertEqual(
+                        [serializer.load(fileobj, chunk_size=chunk_size)
+                         for dummy in objects], objects)
+                    self.assertEqual(fileobj.read(), b'tail')
+
+    def test_truncated(self):
+        """serializers - streaming load of truncated data."""
+        from io import BytesIO
+        from invenio_utils.serializers import SerializerError, ZlibPickle
+        blob = ZlibPickle.dumps(range(1000))
+        self.assertRaises(SerializerError, ZlibPickle.load,
+                          BytesIO(blob[:len(blob) // 2]))
+
+
+class DictionarySerializerTest(InvenioTestCase):
+
+    """Test zlib compression with a preset dictionary."""
+
+    def records(self, start, stop):
+        return [{'recid': recid, 'title': u'Measurement of the W mass',
+                 'collection': 'ARTICLE', 'authors': ['Ellis, J.', 'Higgs, P.'],
+                 'year': 2000 + recid % 15} for recid in range(start, stop)]
+
+    def test_round_trip(self):
+        """serializers - dictionary compression round trip and ratio."""
+        from invenio_utils.serializers import ZlibDictionary, \
+            ZlibDictMarshal, ZlibMarshal
+        dictionary = ZlibDictionary.train(
+            ZlibDictMarshal.sample(record) for record in self.records(0, 50))
+        serializer = ZlibDictMarshal([dictionary])
+        for record in self.records(100, 110):
+            blob = serializer.dumps(record)
+            self.assertEqual(serializer.loads(blob), record)
+            self.assertTrue(len(blob) < len(ZlibMarshal.dumps(record)))
+
+    def test_versions(self):
+        """serializers - dictionary versions are looked up by id."""
+        from invenio_utils.serializers import SerializerError, \
+            ZlibDictionary, ZlibDictMarshal
+        old = ZlibDictionary(b'recid collection ARTICLE')
+        new = ZlibDictionary(b'recid collection ARTICLE title authors')
+        self.assertNotEqual(old.dict_id, new.dict_id)
+        record = self.records(0, 1)[0]
+        old_blob = ZlibDictMarshal([old]).dumps(record)
+        self.assertEqual(ZlibDictMarshal([new, old]).loads(old_blob), record)
+        self.assertRaises(SerializerError, ZlibDictMarshal([new]).loads,
+                          old_blob)
+
+
+class ArchiveTest(InvenioTestCase):
+
+    """Test random-access archive of serialized objects."""
+
+    def setUp(self):
+        import tempfile
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+
+    def test_get_and_iterate(self):
+        """serializers - archive random access and sequential iteration."""
+        import os
+        from invenio_utils.serializers import ArchiveReader, ArchiveWriter
+        path = os.path.join(self.tmpdir, 'records.arc')
+        records = [(recid, dict(RECORD, recid=recid))
+                   for recid in range(100, 0, -1)]
+        with ArchiveWriter(path) as archive:
+            for recid, record in records:
+                archive.add(recid, record)
+            self.assertFalse(os.path.exists(path))
+        with ArchiveReader(path) as archive:
+            self.assertEqual(len(archive), 100)
+            self.assertEqual(archive[42], dict(RECORD, recid=42))
+            self.assertEqual(archive.get(1000), None)
+            self.assertFalse(1000 in archive)
+            self.assertEqual(list(archive.iteritems()), records)
+
+    def test_invalid(self):
+        """serializers - archive errors."""
+        import os
+        from invenio_utils.serializers import ArchiveReader, ArchiveWriter, \
+            SerializerError
+        path = os.path.join(self.tmpdir, 'broken.arc')
+        try:
+            with ArchiveWriter(path) as archive:
+                archive.add(1, RECORD)
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(os.listdir(self.tmpdir), [])
+        with ArchiveWriter(path) as archive:
+            archive.add(1, RECORD)
+        with open(path, 'rb') as fileobj:
+            data = fileobj.read()
+        with open(path, 'wb') as fileobj:
+            fileobj.write(data[:-3])
+        self.assertRaises(SerializerError, ArchiveReader, path)
+        open(path, 'wb').close()
+        self.assertRaises(SerializerError, ArchiveReader, path)
+
+
+class BatchSerializerTest(InvenioTestCase):
+
+    """Test parallel batch serialization."""
+
+    def test_round_trip(self):
+        """serializers - dumps_many and loads_many keep the order."""
+        from invenio_utils.serializers import ZlibPickle, dumps_many, \
+            loads_many
+        records = [dict(RECORD, recid=recid) for recid in range(50)]
+        for workers in (1, 2):
+            blobs = dumps_many(records, workers=workers, chunksize=3)
+            self.assertEqual(loads_many(blobs, workers=workers), records)
+        blobs = dumps_many(records, codec=ZlibPickle, workers=2)
+        self.assertEqual([ZlibPickle.loads(blob) for blob in blobs], records)
+        self.assertEqual(loads_many(blobs, serializer=ZlibPickle, workers=2),
+                         records)
+        self.assertEqual(dumps_many([], workers=2), [])
+
+    def test_dictionary(self):
+        """serializers - dumps_many and loads_many with a dictionary."""
+        from invenio_utils.serializers import ZlibDictionary, \
+            ZlibDictMarshal, dumps_many, loads_many
+        records = [dict(RECORD, recid=recid) for recid in range(50)]
+        dictionary = ZlibDictionary.train(
+            ZlibDictMarshal.sample(record) for record in records)
+        serializer = ZlibDictMarshal([dictionary])
+        blobs = dumps_many(records, codec=serializer, workers=2)
+        self.assertEqual([serializer.loads(blob) for blob in blobs], records)
+        self.assertEqual(loads_many(blobs, serializer=serializer, workers=2),
+                         records)
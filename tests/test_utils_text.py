@@ -28,22 +28,49 @@ try:
 except ImportError:
     CHARDET_AVAILABLE = False
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from unittest import skipIf
+
+from six import StringIO
 from unidecode import unidecode
 
 from invenio_base.wrappers import lazy_import
 from invenio_testing import InvenioTestCase
 
 decode_to_unicode = lazy_import('invenio_utils.text:decode_to_unicode')
+detect_encoding = lazy_import('invenio_utils.text:detect_encoding')
 escape_latex = lazy_import('invenio_utils.text:escape_latex')
+escape_latex_many = lazy_import('invenio_utils.text:escape_latex_many')
 guess_minimum_encoding = lazy_import('invenio_utils.text:guess_minimum_encoding')
+indent_text = lazy_import('invenio_utils.text:indent_text')
+iter_show_diff = lazy_import('invenio_utils.text:iter_show_diff')
+iter_indented_text = lazy_import('invenio_utils.text:iter_indented_text')
+iter_text_in_a_box = lazy_import('invenio_utils.text:iter_text_in_a_box')
+nice_number = lazy_import('invenio_utils.text:nice_number')
+nice_numbers = lazy_import('invenio_utils.text:nice_numbers')
+nice_size = lazy_import('invenio_utils.text:nice_size')
+nice_sizes = lazy_import('invenio_utils.text:nice_sizes')
+remove_line_breaks = lazy_import('invenio_utils.text:remove_line_breaks')
+remove_line_breaks_many = lazy_import('invenio_utils.text:remove_line_breaks_many')
 show_diff = lazy_import('invenio_utils.text:show_diff')
+slugify = lazy_import('invenio_utils.text:slugify')
+slugify_many = lazy_import('invenio_utils.text:slugify_many')
 strip_accents = lazy_import('invenio_utils.text:strip_accents')
+strip_accents_many = lazy_import('invenio_utils.text:strip_accents_many')
 translate_latex2unicode = lazy_import('invenio_utils.text:translate_latex2unicode')
 translate_to_ascii = lazy_import('invenio_utils.text:translate_to_ascii')
+translate_to_ascii_many = lazy_import('invenio_utils.text:translate_to_ascii_many')
 transliterate_ala_lc = lazy_import('invenio_utils.text:transliterate_ala_lc')
+transliterate_ala_lc_many = lazy_import('invenio_utils.text:transliterate_ala_lc_many')
 wash_for_utf8 = lazy_import('invenio_utils.text:wash_for_utf8')
 wash_for_xml = lazy_import('invenio_utils.text:wash_for_xml')
 wrap_text_in_a_box = lazy_import('invenio_utils.text:wrap_text_in_a_box')
+write_text_in_a_box = lazy_import('invenio_utils.text:write_text_in_a_box')
+xml_entities_to_utf8 = lazy_import('invenio_utils.text:xml_entities_to_utf8')
 
 
 class GuessMinimumEncodingTest(InvenioTestCase):
@@ -194,6 +221,48 @@ class WashForXMLTest(InvenioTestCase):
                                       xml_version='1.1'), '\x08\tsome chars')
         self.assertEqual(wash_for_xml('$b\bar{b}$', xml_version='1.1'), '$b\x08ar{b}$')
 
+    def test_forbidden_multibyte_characters_washing(self):
+        """textutils - washing surrogates and non-characters for XML."""
+        for xml_version in ('1.0', '1.1'):
+            self.assertEqual(wash_for_xml('a\xed\xa0\x80b\xef\xbf\xbec\xef\xbf\xbd',
+                                          xml_version=xml_version),
+                             'abc\xef\xbf\xbd')
+            self.assertRaises(UnicodeDecodeError, wash_for_xml, 'abc\xff',
+                              xml_version=xml_version)
+
+    def test_washing_clean_text(self):
+        """textutils - washing text without illegal characters."""
+        text = '<record>Some title \xc3\xa0 la carte\n</record>\t'
+        self.assertTrue(wash_for_xml(text) is text)
+        self.assertTrue(wash_for_xml('abc', xml_version='1.1') == 'abc')
+
+    def test_escaping_and_washing(self):
+        """textutils - escaping and washing for XML in one go."""
+        from invenio_utils.text import encode_for_xml, escape_and_wash
+        self.assertEqual(encode_for_xml('a < b & "c"\x08', wash=True),
+                         'a &lt; b &amp; "c"')
+        self.assertEqual(encode_for_xml('\x08"\xc3\xa0"', wash=True,
+                                        quote=True, xml_version='1.1'),
+                         '\x08&quot;\xc3\xa0&quot;')
+        text = 'clean text \xc3\xa0 la carte'
+        self.assertTrue(encode_for_xml(text, wash=True) is text)
+        self.assertEqual(escape_and_wash('<\x00>', (('<', '&lt;'), ),
+                                         xml_version='1.0'), '&lt;>')
+        self.assertEqual(escape_and_wash('<\x00>', (('<', '&lt;'), )),
+                         '&lt;\x00>')
+
+    def test_stream_washing(self):
+        """textutils - washing a stream for XML."""
+        from StringIO import StringIO
+        from invenio_utils.text import wash_for_xml_stream
+        text = ('<a>\x08\xc3\xa0\xe6\x98\xa5\x00\xed\xa0\x80</a>\n' * 50)
+        for xml_version in ('1.0', '1.1'):
+            output = StringIO()
+            wash_for_xml_stream(StringIO(text), output,
+                                xml_version=xml_version, chunk_size=5)
+            self.assertEqual(output.getvalue(),
+                             wash_for_xml(text, xml_version=xml_version))
+
 
 class WashForUTF8Test(InvenioTestCase):
     def test_normal_legal_string_washing(self):
@@ -411,6 +480,42 @@ At vero eos et accusamus et iusto odio dignissimos ducimus qui blanditiis praese
 """
         self.assertEqual(wrap_text_in_a_box(text), result)
 
+    def test_rows_and_file_wrap_text_in_a_box(self):
+        """textutils - wrap_text_in_a_box rows and file output."""
+        body = 'Task #1 done with some-thing -- quite long.\n' * 50 + \
+            '    indented  żółw\tline\n\n' + 'averyveryverylongword ' * 5
+        for args in ({}, {'style': 'squared', 'max_col': 20},
+                     {'style': 'ascii', 'title': 'Log', 'break_long': True}):
+            result = wrap_text_in_a_box(body, **args)
+            self.assertEqual('\n'.join(iter_text_in_a_box(body, **args)),
+                             result.strip('\n'))
+            output = StringIO()
+            write_text_in_a_box(output, body, **args)
+            self.assertEqual(output.getvalue(), result)
+
+    def test_fixed_width_wrap_text_in_a_box(self):
+        """textutils - wrap_text_in_a_box with a fixed width."""
+        body = '\n\nTask #1 done.\n' + 'Some more words in a line.\n' * 20
+        for args in ({}, {'style': 'squared', 'title': 'Log'},
+                     {'style': 'ascii', 'min_col': 60}):
+            result = wrap_text_in_a_box(body, max_col=40, fixed_width=True,
+                                        **args)
+            min_col = max(args.pop('min_col', 0), 40)
+            self.assertEqual(result, wrap_text_in_a_box(
+                body, max_col=40, min_col=min_col, **args))
+        rows = iter_text_in_a_box('word ' * 10 ** 6, max_col=20,
+                                  fixed_width=True)
+        self.assertEqual(next(rows), next(iter_text_in_a_box(
+            'word', max_col=20, fixed_width=True)))
+
+    def test_indent_text(self):
+        """textutils - indent_text."""
+        self.assertEqual(indent_text('a\nb', 2, '-', '\n', '\r\n'),
+                         '--a\r\n--b\r\n')
+        self.assertEqual(list(iter_indented_text('a\nb', 1)), ['  a', '  b'])
+        self.assertEqual('\n'.join(iter_indented_text('a b', 1, wrap=True)),
+                         indent_text('a b', 1, wrap=True))
+
 
 class DecodeToUnicodeTest(InvenioTestCase):
     """Test functions related to decode_to_unicode function."""
@@ -420,6 +525,53 @@ class DecodeToUnicodeTest(InvenioTestCase):
             self.assertEqual(decode_to_unicode('\202\203\204\205', default_encoding='latin1'), u'\x82\x83\x84\x85')
             self.assertEqual(decode_to_unicode('àèéìòù'), u'\xe0\xe8\xe9\xec\xf2\xf9')
             self.assertEqual(decode_to_unicode('Ιθάκη'), u'\u0399\u03b8\u03ac\u03ba\u03b7')
+
+        def test_decode_to_unicode_sample(self):
+            """textutils - decode_to_unicode of a large text"""
+            text = u'plain text ' * 10000 + \
+                u'\u041c\u043e\u0441\u043a\u0432\u0430, ' * 500
+            self.assertEqual(detect_encoding(text.encode('cp1251'),
+                                             sample_size=4096),
+                             'windows-1251')
+            self.assertEqual(decode_to_unicode(text.encode('cp1251')), text)
+
+        def test_decode_to_unicode_ascii_context(self):
+            """textutils - decode_to_unicode weighs ASCII before non-ASCII"""
+            from invenio_utils import text as textutils
+            samples = []
+
+            class Detector(textutils.UniversalDetector):
+                def feed(self, data):
+                    samples.append(data)
+                    return super(Detector, self).feed(data)
+
+            original = textutils.UniversalDetector
+            textutils.UniversalDetector = Detector
+            try:
+                short = '\\ss\xff<\\ss'
+                detect_encoding(short)
+                self.assertEqual(''.join(samples), short)
+                del samples[:]
+                prefix = 'plain text ' * 100
+                detect_encoding(prefix + short, sample_size=512)
+                sample = ''.join(samples)
+                self.assertTrue((prefix + short).endswith(sample))
+                self.assertTrue(len(sample) <= 512)
+                self.assertTrue(sample.index('\xff') >= 128)
+            finally:
+                textutils.UniversalDetector = original
+            self.assertEqual(decode_to_unicode(short), u'\\ss\xff<\\ss')
+
+        def test_decode_to_unicode_source(self):
+            """textutils - decode_to_unicode remembers source encodings"""
+            text = u'\u0424\u0438\u0437\u0438\u043a\u0430'
+            self.assertNotEqual(decode_to_unicode(text.encode('cp1251')),
+                                text)
+            feed = u'\u041c\u043e\u0441\u043a\u0432\u0430 ' * 100
+            self.assertEqual(decode_to_unicode(feed.encode('cp1251'),
+                                               source='feed'), feed)
+            self.assertEqual(decode_to_unicode(text.encode('cp1251'),
+                                               source='feed'), text)
     else:
         pass
 
@@ -434,6 +586,94 @@ class Latex2UnicodeTest(InvenioTestCase):
         self.assertEqual(translate_latex2unicode("\\AAkeson"), u'\u212bkeson')
         self.assertEqual(translate_latex2unicode("$\\mathsl{\\Zeta}$"), u'\U0001d6e7')
 
+    def test_latex_to_unicode_equivalence(self):
+        """textutils - latex_to_unicode matches the per-symbol algorithm"""
+        import re
+        from invenio_utils.text import CFG_LATEX_UNICODE_TRANSLATION_CONST, \
+            get_kb_filename
+
+        def reference(text):
+            # Former implementation: one re.sub over the text per match.
+            text = text.decode('utf-8')
+            symbols = re.compile('|'.join(
+                re.escape(line.decode('utf-8').split('|--|')[0])
+                for line in open(get_kb_filename())))
+            for match in symbols.finditer(text):
+                text = re.sub("[\\{\\$]?%s[\\}\\$]?" % (re.escape(match.group()),),
+                              lambda dummy: CFG_LATEX_UNICODE_TRANSLATION_CONST['table'][match.group()],
+                              text)
+            return text
+
+        abstracts = [
+            "We study the decay $B^0 \\to K^{*0} \\mu^+ \\mu^-$ at $\\sqrt{s}=7$ TeV.",
+            'Sch\\"{o}dinger, G\\"odel and Erd\\H{o}s in {\\AA}ngstr\\"om units.',
+            "The $\\alpha_s$ and $\\Lambda_{QCD}$ values, \\'Etude \\`a la \\c{c}a.",
+            "Cross section $\\sigma \\approx 5 \\pm 1$ pb with $\\Delta\\phi \\leq \\pi$.",
+            "No LaTeX at all in this abstract.",
+            'Na\\"{\\i}ve \\v{S}koda, \\L{}\\\'od\\\'z and \\o{}re{\\ss}.',
+        ]
+        translate_latex2unicode('')
+        for abstract in abstracts:
+            self.assertEqual(translate_latex2unicode(abstract),
+                             reference(abstract))
+        self.assertEqual(translate_latex2unicode("\\$\\mu$"), u"$\u03bc")
+        self.assertEqual(translate_latex2unicode("\\`{\\i}"), u"\xec")
+
+    def test_latex_to_unicode_kb_file(self):
+        """textutils - latex_to_unicode with a custom KB file"""
+        import os
+        import shutil
+        import tempfile
+        from invenio_utils import text
+
+        tmpdir = tempfile.mkdtemp()
+        kb_file = os.path.join(tmpdir, 'custom.kb')
+        cache_dir = os.path.join(tmpdir, 'cache')
+        settings = (text.CFG_LATEX_UNICODE_CACHE_DIR,
+                    text.CFG_LATEX_UNICODE_RELOAD_INTERVAL)
+        try:
+            with open(kb_file, 'w') as kb:
+                kb.write('\\foo|--|F\n')
+            os.utime(kb_file, (1000000000, 1000000000))
+            self.assertEqual(translate_latex2unicode('$\\foo$ \\alpha',
+                                                     kb_file=kb_file),
+                             u'F \\alpha')
+            self.assertEqual(translate_latex2unicode('\\foo \\alpha'),
+                             u'\\foo \u03b1')
+            self.assertEqual(os.listdir(tmpdir), ['custom.kb'])
+
+            # The KB is not checked again within the reload interval.
+            os.utime(kb_file, (1000000010, 1000000010))
+            self.assertEqual(translate_latex2unicode('\\foo',
+                                                     kb_file=kb_file), u'F')
+            text._LATEX_UNICODE_TABLES.pop(kb_file)
+
+            # The precompiled form is written to the cache directory and
+            # used when the KB has not changed.
+            text.CFG_LATEX_UNICODE_CACHE_DIR = cache_dir
+            text.CFG_LATEX_UNICODE_RELOAD_INTERVAL = 0
+            self.assertEqual(translate_latex2unicode('\\foo',
+                                                     kb_file=kb_file), u'F')
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            text._LATEX_UNICODE_TABLES.pop(kb_file)
+            with open(kb_file, 'a') as kb:
+                kb.write('\\bar|--|B\n')
+            os.utime(kb_file, (1000000010, 1000000010))
+            self.assertEqual(translate_latex2unicode('\\foo\\bar',
+                                                     kb_file=kb_file),
+                             u'F\\bar')
+
+            # A modified KB is reloaded.
+            os.utime(kb_file, (1000000020, 1000000020))
+            self.assertEqual(translate_latex2unicode('\\foo\\bar',
+                                                     kb_file=kb_file),
+                             u'FB')
+        finally:
+            (text.CFG_LATEX_UNICODE_CACHE_DIR,
+             text.CFG_LATEX_UNICODE_RELOAD_INTERVAL) = settings
+            text._LATEX_UNICODE_TABLES.pop(kb_file, None)
+            shutil.rmtree(tmpdir)
+
 
 class TestStripping(InvenioTestCase):
     """Test for stripping functions like accents and control characters."""
@@ -451,6 +691,19 @@ class TestStripping(InvenioTestCase):
         self.assertEqual(translate_to_ascii([None]), [None])
         self.assertEqual(translate_to_ascii("√"), [""])
 
+    def test_text_to_ascii_many(self):
+        """textutils - transliterate many values to ascii"""
+        values = ["H\xc3\xb6hne", None, "", "àèéìòù", "√", "àèéìòù"]
+        expected = translate_to_ascii(list(values))
+        result = translate_to_ascii_many(iter(values))
+        self.assertFalse(isinstance(result, list))
+        self.assertEqual(list(result), expected)
+        self.assertEqual(list(translate_to_ascii_many(values, workers=2,
+                                                      chunksize=2)),
+                         expected)
+        self.assertEqual(list(transliterate_ala_lc_many(
+            [u"\u00c5ge", None, u"\u00c5ge"])), ["Age", None, "Age"])
+
     def test_strip_accents(self):
         """textutils - transliterate to ascii (basic)"""
         self.assertEqual("memememe",
@@ -462,6 +715,21 @@ class TestStripping(InvenioTestCase):
         self.assertEqual("OE",
                          strip_accents('Œ'))
 
+    def test_strip_accents_latex(self):
+        """textutils - strip LaTeX accents"""
+        self.assertEqual('Muller, Jerome Cedric Nunez',
+                         strip_accents('M\\"uller, J\\\'er\\^{o}me '
+                                       'C\\\'edric Nu\\~{n}ez'))
+        self.assertEqual('aeOE Cc Nn', strip_accents('\\ae{}\\OE \\c{C}\\uc \\vN\\~n'))
+        self.assertEqual('x Y', strip_accents('\\"y \\\'{Y}'))
+        self.assertEqual('\xffe', strip_accents('\xff\\\'e'))
+
+    def test_strip_accents_many(self):
+        """textutils - strip accents of many phrases"""
+        self.assertEqual(['Muller', 'Jorg', 'Ellis'],
+                         strip_accents_many(['Müller', 'J\\"org', 'Ellis']))
+        self.assertEqual([], strip_accents_many(iter([])))
+
 class TestDiffering(InvenioTestCase):
     """Test for differing two strings."""
 
@@ -548,6 +816,29 @@ Aenean ultrices condimentum quam vitae pharetra.
                                    prefix_added='<strong class="diff_field_added">',
                                    suffix_added='</strong>'), expected_result)
 
+    def test_show_diff_myers(self):
+        """textutils - show_diff() with the Myers algorithm"""
+        self.assertEqual(show_diff(self.string1, self.string2,
+                                   algorithm='myers'),
+                         show_diff(self.string1, self.string2))
+        original = '\n'.join(['a', 'b', 'c', 'b', 'd'] * 100)
+        modified = original.replace('c', 'e', 1)
+        lines = iter_show_diff(original, modified, algorithm='myers')
+        self.assertEqual([next(lines) for dummy in range(4)],
+                         [' a', ' b', '-e', '+c'])
+        self.assertEqual(show_diff(original, modified, algorithm='myers',
+                                   max_lines=3), '\n a\n b\n-e\n ...\n')
+        original = '\n'.join(['a', 'b'] * 3)
+        modified = '\n'.join(['a', 'c'] * 3)
+        self.assertEqual(show_diff(original, modified, algorithm='myers',
+                                   max_lines=5),
+                         '\n a\n-c\n+b\n a\n-c\n ...\n')
+        self.assertEqual(show_diff(original, modified, algorithm='myers',
+                                   max_edits=1),
+                         '\n a\n-c\n-a\n-c\n-a\n-c\n+b\n+a\n+b\n+a\n+b\n')
+        self.assertRaises(ValueError, show_diff, original, modified,
+                          algorithm='unknown')
+
 
 class TestALALC(InvenioTestCase):
     """Test for handling ALA-LC transliteration."""
@@ -568,3 +859,136 @@ class LatexEscape(InvenioTestCase):
         escaped = escape_latex(unescaped)
         self.assertEqual(escaped,
                          "this is unescaped latex \\& \\% \\$ \\# \\_ \\{ \\} \\~{}  \\textbackslash{} \\^{} and some multi-byte chars: \xc5\xbc\xc3\xb3\xc5\x82w m\xc3\xa9m\xc3\xaam\xc3\xabm\xc3\xa8")
+
+
+    def test_escape_latex_many(self):
+        """textutils - escaping LaTeX in a sequence of strings"""
+        self.assertEqual(
+            escape_latex_many(['50% of $x_1$', 'clean', u'a {b}', '']),
+            ['50\\% of \\$x\\_1\\$', 'clean', 'a \\{b\\}', ''])
+        self.assertRaises(UnicodeDecodeError, escape_latex, 'caf\xe9 & co')
+
+
+class RemoveLineBreaksTest(InvenioTestCase):
+    """Test functions related to removing line breaks."""
+
+    def test_remove_line_breaks(self):
+        """textutils - removing line breaks"""
+        self.assertEqual(remove_line_breaks('a\r\nb\fc\n'), 'abc')
+        self.assertEqual(remove_line_breaks('\xc3\xa9t\xc3\xa9'),
+                         '\xc3\xa9t\xc3\xa9')
+        self.assertEqual(remove_line_breaks(
+            u'a\xc2\x85b\xe2\x80\n\xa8c'.encode('utf-8')), 'abc')
+        self.assertEqual(remove_line_breaks_many(['a\nb', '', 'c']),
+                         ['ab', '', 'c'])
+        self.assertRaises(UnicodeDecodeError, remove_line_breaks, '\xe9\n')
+
+
+class SlugifyTest(InvenioTestCase):
+    """Test functions related to slugs."""
+
+    def test_slugify(self):
+        """textutils - generating slugs"""
+        self.assertEqual(slugify(u'Search for $B_s^0$ decays, part II.'),
+                         u'search-for-b-s-0-decays-part-ii')
+        self.assertEqual(slugify(u'Żółw «mémé»'), u'zolw-<<meme>>')
+        self.assertEqual(slugify_many([u'Higgs boson', u'', u'a/b'], u'_'),
+                         [u'higgs_boson', u'', u'a_b'])
+
+
+class NiceNumberTest(InvenioTestCase):
+    """Test for number and size formatting."""
+
+    def test_nice_number(self):
+        """textutils - nicely printed numbers"""
+        self.assertEqual(nice_number(0), '0')
+        self.assertEqual(nice_number(1234567), '1,234,567')
+        self.assertEqual(nice_number(1234567, ' '), '1 234 567')
+        self.assertEqual(nice_number(-1234), '-1,234')
+        self.assertEqual(nice_number(1234.5678, max_ndigits_after_dot=2),
+                         '1,234.57')
+
+    def test_nice_numbers(self):
+        """textutils - nicely printed numbers in batch"""
+        numbers = [0, 999, 1000, -123456, 10 ** 20, 1234.5678, -0.5]
+        self.assertEqual(nice_numbers(numbers, '.', 1),
+                         [nice_number(number, '.', 1) for number in numbers])
+
+    def test_nice_sizes(self):
+        """textutils - nicely printed sizes in batch"""
+        sizes = [0, 1024, 1025, 1536.0, 5 * 1024 ** 2, 3 * 1024 ** 3 + 1,
+                 7 * 1024 ** 4]
+        self.assertEqual(nice_sizes(sizes),
+                         [nice_size(size) for size in sizes])
+        self.assertEqual(nice_sizes(sizes[:4]),
+                         ['0 B', '1,024 B', '1.0 KB', '1.5 KB'])
+
+    @skipIf(numpy is None, 'NumPy is not installed')
+    def test_nice_numbers_numpy(self):
+        """textutils - nicely printed NumPy arrays"""
+        numbers = numpy.array([[0, 999, 1000], [-123456, 10 ** 15, 7]])
+        floats = numpy.array([1234.5678, -0.5, 0.0, 1e6])
+        for array in (numbers, floats):
+            self.assertEqual(nice_numbers(array, '.', 1),
+                             [nice_number(number, '.', 1)
+                              for number in array.ravel().tolist()])
+        sizes = numpy.array([0, 1024, 1025, 5 * 1024 ** 2,
+                             3 * 1024 ** 3 + 1, 7 * 1024 ** 4])
+        for array in (sizes, sizes.astype(float), sizes.reshape(2, 3)):
+            self.assertEqual(nice_sizes(array),
+                             [nice_size(size)
+                              for size in array.ravel().tolist()])
+
+
+class XmlEntitiesTest(InvenioTestCase):
+    """Test for XML entity resolution."""
+
+    def test_xml_entities_to_utf8(self):
+        """textutils - resolving XML entities to UTF-8"""
+        self.assertEqual(xml_entities_to_utf8('&eacute;&#233;&#xe9; &bogus;'),
+                         '\xc3\xa9\xc3\xa9\xc3\xa9 &bogus;')
+        self.assertEqual(xml_entities_to_utf8('&lt;b&gt; &amp;'),
+                         '&lt;b&gt; &amp;')
+        self.assertEqual(xml_entities_to_utf8('&lt;b&gt; &amp;', skip=()),
+                         '<b> &')
+        self.assertEqual(xml_entities_to_utf8('&eacute;&#233;',
+                                              skip=['eacute']),
+                         '&eacute;\xc3\xa9')
+        text = 'no references here'
+        self.assertTrue(xml_entities_to_utf8(text) is text)
+
+
+class TextPipelineTest(InvenioTestCase):
+    """Test for chaining text normalization steps."""
+
+    def test_pipeline_matches_helpers(self):
+        """textutils - text pipeline matches the one-shot helpers"""
+        from invenio_utils.text import TextPipeline, remove_line_breaks, \
+            xml_entities_to_utf8
+        normalize = TextPipeline().wash_for_utf8().xml_entities_to_utf8() \
+            .translate_latex2unicode().remove_line_breaks().wash_for_xml() \
+            .strip_accents()
+        for text in ['Ern&#246; Schr\\"{o}dinger $\\alpha$\nline\x01',
+                     'caf\xc3\xa9 &amp; &eacute; \xff',
+                     'M\\"uller &lt;b&gt;\r\n']:
+            expected = xml_entities_to_utf8(wash_for_utf8(text))
+            expected = translate_latex2unicode(expected).encode('utf-8')
+            expected = strip_accents(wash_for_xml(
+                remove_line_breaks(expected)))
+            self.assertEqual(normalize(text), expected)
+        self.assertEqual(normalize.to_unicode()('&#246;'), u'o')
+        self.assertEqual(TextPipeline().escape_latex()('caf\xc3\xa9 {50%}'),
+                         escape_latex('caf\xc3\xa9 {50%}'))
+
+    def test_pipeline_records(self):
+        """textutils - text pipeline on generators of records"""
+        from invenio_utils.text import TextPipeline
+        normalize = TextPipeline().remove_line_breaks().then(
+            lambda text: text.upper())
+        records = ({'recid': recid, 'title': 'title\n%d' % recid}
+                   for recid in range(3))
+        result = normalize.map_records(records, fields=('title', 'abstract'))
+        self.assertEqual(next(result), {'recid': 0, 'title': 'TITLE0'})
+        self.assertEqual([record['title'] for record in result],
+                         ['TITLE1', 'TITLE2'])
+        self.assertEqual(list(normalize.map(['a\nb', u'c'])), ['AB', 'C'])
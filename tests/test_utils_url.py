@@ -27,6 +27,7 @@ from invenio_base.wrappers import lazy_import
 from invenio_testing import InvenioTestCase
 
 HASHLIB_IMPORTED = lazy_import('invenio_utils.url:HASHLIB_IMPORTED')
+URLTemplate = lazy_import('invenio_utils.url:URLTemplate')
 create_AWS_request_url = lazy_import('invenio_utils.url:create_AWS_request_url')
 create_Indico_request_url = lazy_import('invenio_utils.url:create_Indico_request_url')
 create_html_link = lazy_import('invenio_utils.url:create_html_link')
@@ -89,6 +90,22 @@ class TestUrls(InvenioTestCase):
                                     escape_urlargd=False),
                          'http://www.a.com/search?of=hb&&amp;recid=3')
 
+    def test_url_template(self):
+        """urlutils - test url creation from a template"""
+        template = URLTemplate('http://www.a.com/search', {'of': 'hb&'},
+                               variables=('recid', ), urlhash='top')
+        for recid in (3, '<3>', -1):
+            self.assertEqual(template.url({'recid': recid}),
+                             create_url('http://www.a.com/search',
+                                        {'of': 'hb&', 'recid': recid},
+                                        urlhash='top'))
+        self.assertEqual(URLTemplate('http://www.a.com/search').url(),
+                         'http://www.a.com/search')
+        buffer = ['<p>']
+        URLTemplate('http://www.a.com', {'of': 'hb&'},
+                    escape_urlargd=False).write_url(buffer)
+        self.assertEqual(buffer, ['<p>', 'http://www.a.com?of=hb&'])
+
     def test_canonical_urlargd_creation(self):
         """urlutils - test creation of canonical URLs"""
         self.assertEqual(make_canonical_urlargd({'a' : 1,
@@ -235,6 +252,25 @@ class TestHtmlLinks(InvenioTestCase):
                                           escape_linkattrd=False),
                          '<a href="http://www.a.com?a=1&amp;%3A=%3F&amp;b%26=2%3D&amp;b=2" style="color:#f00" target="_blank">my label > & better than yours</a>')
 
+    def test_html_link_template(self):
+        """urlutils - test creation of HTML links from a template"""
+        linkattrd = {'style': 'color:#f00', 'target': "_blank"}
+        for escape_urlargd in (True, False):
+            template = URLTemplate('http://www.a.com', {'a': 1, ':': '?'},
+                                   ('b', 'b&'), linkattrd,
+                                   escape_urlargd=escape_urlargd)
+            buffer = []
+            template.write_html_link(buffer, {'b': '2', 'b&': '2='},
+                                     'my label > & better than yours')
+            self.assertEqual(''.join(buffer), create_html_link(
+                'http://www.a.com', {'a': 1, ':': '?', 'b': '2', 'b&': '2='},
+                'my label > & better than yours', linkattrd,
+                escape_urlargd=escape_urlargd))
+        self.assertEqual(
+            URLTemplate('http://www.a.com/\xc3', {'ln': 'en'},
+                        ('recid', )).html_link({'recid': 1}, 'a\xff'),
+            '<a href="http://www.a.com/?ln=en&amp;recid=1">a</a>')
+
     def test_string_to_numeric_char_reference(self):
         """urlutils - test numeric character conversion from string"""
 